@@ -0,0 +1,112 @@
+"""搜索打分微基准
+
+对比两种打分方式的单文档耗时，并确认打分结果一致：
+- original_score_item：优化前的 score_item 原样复制，每个文档都重新解析查询（正则识别、编译、jieba 分词）
+- CompiledQuery：每个请求只编译一次查询，再对所有文档复用
+
+用法: python bench_search.py [重复次数]
+"""
+import re, sys, time, logging
+import server
+
+logging.disable(logging.CRITICAL)
+
+QUERIES = ["动态", "API", "开发 优化", "coding", "/动.?态/", "/api/i", "渲"]
+
+def original_segment_terms(s):
+    """优化前的 segment_terms（jieba 分词）"""
+    s = (s or "").strip()
+    if not s:
+        return []
+    toks = []
+    jieba = server.get_jieba()
+    if jieba:
+        try:
+            toks = list(jieba.cut_for_search(s))
+        except Exception:
+            toks = []
+    if not toks:
+        ascii_runs = re.findall(r"[A-Za-z0-9_]+", s)
+        zh_runs = re.findall(r"[\u4e00-\u9fff]+", s)
+        toks = ascii_runs + zh_runs
+    seen = set(); ordered = []
+    for t in toks:
+        tl = t.lower()
+        if tl and tl not in seen:
+            seen.add(tl)
+            ordered.append(tl)
+    return ordered
+
+def original_score_item(q, item_text, name="", tags=None):
+    """优化前的 score_item（原样复制），作为正确性和耗时的对照"""
+    tags = tags or []
+    s = (q or "").strip()
+    if not s:
+        return 0
+    hay = f"{name} {' '.join(tags)} {item_text}".lower()
+    sc = 0
+    is_regex = re.match(r"^\s*/.+/[a-zA-Z0-9]*\s*$", s)
+    if is_regex:
+        try:
+            m = re.match(r"^\s*/(.+)/([a-zA-Z0-9]*)\s*$", s)
+            pattern = m.group(1)
+            flags = 0
+            if m.group(2):
+                if 'i' in m.group(2): flags |= re.IGNORECASE
+            reg = re.compile(pattern, flags)
+            if reg.search(hay): sc += 90
+        except Exception:
+            pass
+    else:
+        ql = s.lower()
+        small_ascii = len(ql) < 2 and re.match(r"^[\x00-\x7F]+$", ql)
+        if any(t.lower() == ql for t in tags): sc += 120
+        if name.lower().startswith(ql): sc += 90
+        if not small_ascii:
+            if ql in name.lower(): sc += 70
+            if ql in hay: sc += 110
+        toks = original_segment_terms(ql)
+        for t in toks:
+            L = max(1, len(t))
+            base = 8 * L
+            if any(tt.lower() == t for tt in tags): sc += base + 40
+            if name.lower().startswith(t): sc += base + 30
+            if t in name.lower(): sc += base + 20
+            if t in hay: sc += base + 16
+    return sc
+
+def load_docs():
+    docs = []
+    for doc_type, catalog in server.search_index.sources.items():
+        for e in catalog.entries():
+            name, tags = server.search_fields(e, doc_type)
+            docs.append((catalog.plain(e), name, tags))
+    return docs
+
+def bench(fn, docs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(docs)
+    return (time.perf_counter() - start) / (repeat * len(docs)) * 1e6
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    docs = load_docs()
+    server.segment_terms("预热")  # 预先加载 jieba 词典，避免计入第一次打分
+    print(f"docs={len(docs)} repeat={repeat}")
+    print(f"{'query':<12}{'original us/doc':>20}{'CompiledQuery us/doc':>24}{'speedup':>10}")
+    for q in QUERIES:
+        def legacy(ds):
+            return [original_score_item(q, t, name=n, tags=tg) for t, n, tg in ds]
+
+        def compiled(ds):
+            cq = server.CompiledQuery(q)
+            return [cq.score(t, name=n, tags=tg) for t, n, tg in ds]
+
+        assert legacy(docs) == compiled(docs), q
+        before = bench(legacy, docs, repeat)
+        after = bench(compiled, docs, repeat)
+        print(f"{q:<12}{before:>20.2f}{after:>24.2f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
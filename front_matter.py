@@ -0,0 +1,53 @@
+"""前置信息的快速解析
+
+单独放在这个模块里，只依赖 PyYAML，测试和其他脚本无需导入 server.py
+"""
+import re
+import yaml
+
+# 有 libyaml 时使用 C 实现的解析器，结果与 yaml.safe_load 相同
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 写入接口生成的前置信息字段，快速解析只处理这些字段
+SIMPLE_FRONT_MATTER_KEYS = {"time", "tags", "name", "icon", "background"}
+# YAML 允许出现在标量中的非 ASCII 字符（不含换行类字符和 BOM）
+_YAML_TEXT = "\u00a0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd\U00010000-\U0010ffff"
+_SIMPLE_LINE = re.compile(r"([a-z]+): +(.*?) *")
+_SIMPLE_DOUBLE = f'"([\\x20\\x21\\x23-\\x5b\\x5d-\\x7e{_YAML_TEXT}]*)"'
+_SIMPLE_SINGLE = f"'([\\x20-\\x26\\x28-\\x7e{_YAML_TEXT}]*)'"
+_SIMPLE_ITEM = f"(?:{_SIMPLE_DOUBLE}|{_SIMPLE_SINGLE})"
+_SIMPLE_STRING = re.compile(_SIMPLE_DOUBLE)
+_SIMPLE_PLAIN = re.compile(f"[{_YAML_TEXT}]+")
+_SIMPLE_LIST = re.compile(f"\\[ *(?:{_SIMPLE_ITEM}(?: *, *{_SIMPLE_ITEM})*)? *\\]")
+_SIMPLE_LIST_ITEM = re.compile(_SIMPLE_ITEM)
+
+def parse_simple_front_matter(fm):
+    """快速解析写入接口生成的简单前置信息，无法确定与 YAML 结果一致时返回 None
+
+    只接受 time / tags / name / icon / background 字段，每行一个，值为不含转义的双引号字符串、
+    由引号字符串组成的单行列表（如 ["a", 'b']），或全部由非 ASCII 字符组成的无引号值（如 Emoji 图标）
+    """
+    meta = {}
+    for line in fm.split("\n"):
+        line = line.rstrip("\r")
+        if not line.strip(" "):
+            continue
+        m = _SIMPLE_LINE.fullmatch(line)
+        if m is None or m.group(1) not in SIMPLE_FRONT_MATTER_KEYS or m.group(1) in meta:
+            return None
+        key, value = m.groups()
+        if value.startswith("["):
+            if _SIMPLE_LIST.fullmatch(value) is None:
+                return None
+            meta[key] = [d if d is not None else q for d, q in
+                         (i.groups() for i in _SIMPLE_LIST_ITEM.finditer(value))]
+        elif value.startswith('"'):
+            m = _SIMPLE_STRING.fullmatch(value)
+            if m is None:
+                return None
+            meta[key] = m.group(1)
+        elif _SIMPLE_PLAIN.fullmatch(value):
+            meta[key] = value
+        else:
+            return None
+    return meta
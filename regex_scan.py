@@ -0,0 +1,12 @@
+"""正则搜索的工作进程任务
+
+单独放在这个模块里，进程池按名称引用 regex_scan.scan_chunk，
+工作进程只需导入本文件（以 gunicorn 等方式启动时不会导入 server.py）
+"""
+import re
+
+def scan_chunk(args):
+    """在工作进程中对一批文档执行正则匹配，返回命中的文档 id"""
+    pattern, flags, docs = args
+    reg = re.compile(pattern, flags)
+    return [doc_id for doc_id, hay in docs if reg.search(hay)]
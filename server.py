@@ -1,20 +1,49 @@
 import os, json, time
 import logging, sys
 import yaml
-from flask import Flask, request, jsonify, send_from_directory, render_template, g, send_file
+from flask import Flask, request, jsonify, send_from_directory, render_template, g, send_file, make_response, Response
 from werkzeug.utils import secure_filename
 from markdown import markdown
 import yaml
 from functools import wraps
 from flask import request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from flask_cors import CORS
 import re
-import jieba
+import regex_scan
+import front_matter
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+import math
+import heapq
+import html as html_lib
+import threading
+import atexit
+import multiprocessing
+import hashlib
+import base64
+import bisect
+import sqlite3
+import pickle
+import mmap
+import contextlib
+try:
+    import fcntl
+except ImportError:  # Windows：没有 gunicorn 多进程，不需要跨进程的构建锁
+    fcntl = None
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 try:
     from latex2mathml.converter import convert as latex_to_mathml
 except ImportError:
     latex_to_mathml = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+import gzip
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 logging.basicConfig(level=logging.DEBUG,
@@ -35,6 +64,20 @@ avatar = config.get("avatar", "")
 
 HOST = config["server"].get("host", "127.0.0.1")
 PORT = config["server"].get("port", 5000)
+CACHE_CONFIG = config.get("cache") or {}
+SEARCH_CONFIG = config.get("search") or {}
+COMPRESS_CONFIG = config.get("compression") or {}
+EVENTS_CONFIG = config.get("events") or {}
+SYNC_CONFIG = config.get("sync") or {}
+SNAPSHOT_CONFIG = config.get("snapshots") or {}
+PRODUCTION_CONFIG = config.get("production") or {}
+PACKS_CONFIG = config.get("packs") or {}
+# 生产模式：python server.py --production，或外部 WSGI 服务器加载时设置环境变量 MOMENTS_PRODUCTION=1
+PRODUCTION = "--production" in sys.argv or os.environ.get("MOMENTS_PRODUCTION") == "1"
+# 归档打包：python server.py --compact，把旧文件打包后退出
+COMPACT = "--compact" in sys.argv
+# 由 multiprocessing 启动的工作进程（冷启动构建、正则搜索）：不加载持久化的索引和旁路文件，不注册退出时的保存
+WORKER_PROCESS = multiprocessing.parent_process() is not None
 
 def require_api_key(f):
     """验证"""
@@ -46,43 +89,6 @@ def require_api_key(f):
         return f(*args, **kwargs)
     return decorated
 
-def filter_by_time_limit(items, time_key="meta", time_field="time"):
-    """
-    根据配置的天数限制过滤数据
-    items: 数据列表，每个元素应该有 meta.time 或类似的字段
-    time_key: 时间字段所在的键（如 "meta"）
-    time_field: 时间字段名（如 "time"）
-    返回: 过滤后的列表
-    """
-    if VIEW_LIMIT < 0:
-        # -1 表示无限制
-        return items
-    
-    now = datetime.now()
-    limit_date = now - timedelta(days=VIEW_LIMIT)
-    filtered = []
-    
-    for item in items:
-        # 支持不同的数据结构
-        if time_key:
-            time_obj = item.get(time_key, {})
-            if isinstance(time_obj, dict):
-                t_str = time_obj.get(time_field, "1970-01-01 00:00:00")
-            else:
-                t_str = str(time_obj)
-        else:
-            t_str = item.get(time_field, "1970-01-01 00:00:00")
-        
-        try:
-            item_time = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-            if item_time >= limit_date:
-                filtered.append(item)
-        except:
-            # 如果时间解析失败，默认保留（向后兼容）
-            filtered.append(item)
-    
-    return filtered
-
 def is_mobile_client():
     """检测是否为移动端客户端请求"""
     user_agent = request.headers.get("User-Agent", "").lower()
@@ -95,6 +101,235 @@ def is_mobile_client():
         return True
     return False
 
+class LRUCache:
+    """线程安全的 LRU 缓存，可按条目数和/或占用字节数限制容量，并统计命中情况"""
+
+    _MISSING = object()
+
+    def __init__(self, max_items=None, max_bytes=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, self._MISSING)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value):
+        size = sys.getsizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and ((self.max_items is not None and len(self._data) > self.max_items) or
+                                  (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else None
+            }
+
+class SharedCache:
+    """生产模式下多个工作进程共享的 SQLite 缓存文件
+
+    - render: 渲染结果，按 (正文 sha1, 是否转换 LaTeX, 扩展集合) 内容寻址，不需要失效；
+      总大小超过 max_render_bytes 时按最近使用时间淘汰（各进程写入时定期检查）
+    - entries: 文件解析结果，按 (目录, 文件名, size, mtime_ns) 校验，文件被删除时一并删除
+    - changes: 内容变更序列，id 自增，作为所有进程共同的内容版本号；其他进程据此立即同步被修改的文件
+    每个进程、每个线程使用独立的连接（fork 之后重新连接）
+    """
+
+    # 读取渲染结果时最多每小时更新一次使用时间，避免每次读取都写库
+    TOUCH_INTERVAL = 3600
+    # 每个进程检查渲染结果总大小的间隔(秒)
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path, max_render_bytes=0):
+        self.path = path
+        self.max_render_bytes = max_render_bytes  # 0 表示不限制
+        self._local = threading.local()
+        self._next_prune = 0.0
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS render (key TEXT PRIMARY KEY, html TEXT, size INTEGER, atime INTEGER);
+                CREATE TABLE IF NOT EXISTS entries (folder TEXT, filename TEXT, size INTEGER, mtime_ns INTEGER,
+                                                    data BLOB, PRIMARY KEY (folder, filename));
+                CREATE TABLE IF NOT EXISTS changes (id INTEGER PRIMARY KEY AUTOINCREMENT, folder TEXT,
+                                                    filename TEXT, sig TEXT, UNIQUE (folder, filename, sig));
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            """)
+            if "atime" not in [row[1] for row in conn.execute("PRAGMA table_info(render)")]:
+                # 旧版本的渲染结果没有大小和使用时间，直接丢弃（只是缓存）
+                conn.executescript("""
+                    DROP TABLE render;
+                    CREATE TABLE IF NOT EXISTS render (key TEXT PRIMARY KEY, html TEXT, size INTEGER, atime INTEGER);
+                """)
+            conn.execute("CREATE INDEX IF NOT EXISTS render_atime ON render (atime)")
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    @staticmethod
+    def render_key(key):
+        digest, convert, extensions = key
+        return f"{digest}:{int(convert)}:{','.join(extensions)}"
+
+    def get_render(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT html, atime FROM render WHERE key = ?", (self.render_key(key),)).fetchone()
+        if row is None:
+            return None
+        now = int(time.time())
+        if row[1] < now - self.TOUCH_INTERVAL:
+            conn.execute("UPDATE render SET atime = ? WHERE key = ?", (now, self.render_key(key)))
+        return row[0]
+
+    def put_render(self, key, html):
+        self._conn().execute("INSERT OR REPLACE INTO render (key, html, size, atime) VALUES (?, ?, ?, ?)",
+                             (self.render_key(key), html, len(html.encode("utf-8")), int(time.time())))
+        if self.max_render_bytes and time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+            self.prune_render()
+
+    def prune_render(self):
+        """渲染结果总大小超过上限时，从最久未使用的开始删除，返回删除的条数"""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM render").fetchone()[0]
+        if total <= self.max_render_bytes:
+            return 0
+        # 按使用时间从新到旧累计大小，删除累计超过上限的部分
+        deleted = conn.execute("""
+            DELETE FROM render WHERE key IN (
+                SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY atime DESC, rowid DESC ROWS UNBOUNDED PRECEDING) AS running FROM render)
+                WHERE running > ?)
+        """, (self.max_render_bytes,)).rowcount
+        logger.info("shared cache render pruned items=%s bytes_before=%s", deleted, total)
+        return deleted
+
+    def get_entry(self, folder, filename, sig):
+        row = self._conn().execute("SELECT data FROM entries WHERE folder = ? AND filename = ? AND size = ? AND mtime_ns = ?",
+                                   (folder, filename, sig[0], sig[1])).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put_entry(self, folder, entry):
+        data = pickle.dumps({k: v for k, v in entry.items() if k != "plain"})
+        self._conn().execute("INSERT OR REPLACE INTO entries (folder, filename, size, mtime_ns, data) VALUES (?, ?, ?, ?, ?)",
+                             (folder, entry["filename"], entry["sig"][0], entry["sig"][1], data))
+
+    def record_change(self, folder, filename, sig):
+        """记录一次变更（同一文件的同一状态只记录一次），返回该变更的序号，并删除该文件更早的记录"""
+        conn = self._conn()
+        query = "SELECT id FROM changes WHERE folder = ? AND filename = ? AND sig = ?"
+        row = conn.execute(query, (folder, filename, sig)).fetchone()
+        if row is not None:
+            # 其他工作进程已经记录过（各进程扫描到同一次磁盘变化）
+            return row[0]
+        # 并发插入同一变更时以先插入的为准
+        conn.execute("INSERT OR IGNORE INTO changes (folder, filename, sig) VALUES (?, ?, ?)", (folder, filename, sig))
+        row = conn.execute(query, (folder, filename, sig)).fetchone()
+        conn.execute("DELETE FROM changes WHERE folder = ? AND filename = ? AND id < ?", (folder, filename, row[0]))
+        if not sig:
+            # 文件已删除，解析结果不会再被使用
+            conn.execute("DELETE FROM entries WHERE folder = ? AND filename = ?", (folder, filename))
+        return row[0]
+
+    def last_change(self):
+        row = self._conn().execute("SELECT MAX(id) FROM changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, last_id):
+        return self._conn().execute("SELECT id, folder, filename FROM changes WHERE id > ? ORDER BY id",
+                                    (last_id,)).fetchall()
+
+    @contextlib.contextmanager
+    def build_lock(self):
+        """跨工作进程的冷启动构建锁（文件锁），同一时间只有一个进程启动进程池构建"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".build.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_meta(self, name):
+        row = self._conn().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value, replace=True):
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        self._conn().execute(f"{verb} INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+shared_cache = None
+if PRODUCTION and PRODUCTION_CONFIG.get("shared_cache", "cache/shared_cache.sqlite3"):
+    shared_cache = SharedCache(PRODUCTION_CONFIG.get("shared_cache", "cache/shared_cache.sqlite3"),
+                               max_render_bytes=int(PRODUCTION_CONFIG.get("shared_render_mb", 256) * 1024 * 1024))
+
+MARKDOWN_EXTENSIONS = ("extra", "codehilite")
+# 渲染缓存：(正文 sha1, 是否转换 LaTeX, 扩展集合) -> HTML
+render_cache = LRUCache(max_bytes=int(CACHE_CONFIG.get("render_cache_mb", 64) * 1024 * 1024))
+# 公式缓存：LaTeX 源码 -> MathML，转换失败记为 False
+formula_cache = LRUCache(max_items=CACHE_CONFIG.get("formula_cache_items", 4096))
+
+# 块级公式 $$...$$ 与行内公式 $...$，一次扫描同时匹配
+# 块级使用非贪婪匹配，避免跨多个公式匹配；行内使用负向前瞻和后顾，确保 $ 不是 $$ 的一部分，且不匹配空内容
+LATEX_PATTERN = re.compile(r'\$\$([^$]+?)\$\$|(?<!\$)\$([^$\n]+?)\$(?!\$)', re.DOTALL)
+
+def latex_to_mathml_cached(latex_code):
+    """转换单个公式，结果在所有动态和状态间共享缓存；转换失败也会缓存，避免每次请求重复报错
+
+    返回 MathML 字符串，转换失败返回 None
+    """
+    mathml = formula_cache.get(latex_code)
+    if mathml is None:
+        try:
+            mathml = latex_to_mathml(latex_code)
+        except Exception as e:
+            logger.warning("latex2mathml conversion error: %s, latex: %s", e, latex_code[:50])
+            mathml = False
+        formula_cache.put(latex_code, mathml)
+    return mathml or None
+
 def render_latex_in_html(html, convert_to_mathml=True):
     """将 HTML 中的 LaTeX 公式转换为 MathML 或保留原始格式
     
@@ -109,62 +344,1335 @@ def render_latex_in_html(html, convert_to_mathml=True):
     if not latex_to_mathml:
         # 如果 latex2mathml 未安装，返回原始 HTML
         return html
-    
-    def replace_latex(match, is_block=False):
-        """替换单个 LaTeX 公式"""
-        latex_code = match.group(1)
-        try:
-            mathml = latex_to_mathml(latex_code)
+
+    matches = list(LATEX_PATTERN.finditer(html))
+    if not matches:
+        return html
+
+    # 同一文档中重复出现的公式只转换一次
+    converted = {}
+    for m in matches:
+        latex_code = m.group(1) if m.group(1) is not None else m.group(2)
+        if latex_code not in converted:
+            converted[latex_code] = latex_to_mathml_cached(latex_code)
+
+    parts = []
+    pos = 0
+    for m in matches:
+        is_block = m.group(1) is not None
+        mathml = converted[m.group(1) if is_block else m.group(2)]
+        parts.append(html[pos:m.start()])
+        if mathml is None:
+            # 转换失败时保留原始 LaTeX
+            parts.append(m.group(0))
+        elif is_block:
             # 如果是块级公式，用 div 包裹并居中
-            if is_block:
-                return f'<div style="text-align: center; margin: 16px 0;">{mathml}</div>'
-            return mathml
-        except Exception as e:
-            logger.warning("latex2mathml conversion error: %s, latex: %s", e, latex_code[:50])
-            # 转换失败时返回原始 LaTeX
-            return match.group(0)
-    
-    # 先处理块级公式 $$...$$
-    # 使用非贪婪匹配，避免跨多个公式匹配
-    html = re.sub(r'\$\$([^$]+?)\$\$', lambda m: replace_latex(m, is_block=True), html, flags=re.DOTALL)
-    
-    # 再处理行内公式 $...$
-    # 使用负向前瞻和后顾，确保 $ 不是 $$ 的一部分，且不匹配空内容
-    html = re.sub(r'(?<!\$)\$([^$\n]+?)\$(?!\$)', lambda m: replace_latex(m, is_block=False), html)
-    
-    return html
+            parts.append(f'<div style="text-align: center; margin: 16px 0;">{mathml}</div>')
+        else:
+            parts.append(mathml)
+        pos = m.end()
+    parts.append(html[pos:])
+    return "".join(parts)
 
-def load_post(filepath, convert_latex_to_mathml=True):
-    """读取单个动态文件，返回字典
-    
-    Args:
-        filepath: 文件路径
-        convert_latex_to_mathml: 是否将 LaTeX 转换为 MathML（移动端设为 False）
+def parse_front_matter(text):
+    """解析 Markdown 文件的 YAML 前置信息，返回 (meta, body)
+
+    写入接口生成的简单格式直接手工解析，其余情况交给 YAML 解析器
     """
-    with open(filepath, "r", encoding="utf-8") as f:
-        text = f.read()
-    # 解析 Markdown + YAML 前置信息
     if text.startswith("---"):
         try:
             _, fm, body = text.split("---", 2)
-            meta = yaml.safe_load(fm) or {}
+            meta = front_matter.parse_simple_front_matter(fm)
+            if meta is None:
+                meta = yaml.load(fm, Loader=front_matter.YAML_LOADER) or {}
         except:
             meta = {}
             body = text
     else:
         meta = {}
         body = text
+    return meta, body
+
+def body_digest(body):
+    """计算正文的 sha1，用作渲染缓存键"""
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+def render_markdown(body, convert_latex_to_mathml=True, digest=None):
+    """渲染 Markdown 正文并处理 LaTeX 公式，结果按内容缓存
+
+    Args:
+        body: Markdown 正文
+        convert_latex_to_mathml: 是否将 LaTeX 转换为 MathML
+        digest: 正文的 sha1（可选，调用方已计算时传入避免重复计算）
+    """
+    key = (digest or body_digest(body), bool(convert_latex_to_mathml), MARKDOWN_EXTENSIONS)
+    html = render_cache.get(key)
+    if html is None and shared_cache is not None:
+        # 其他工作进程已经渲染过的内容直接复用
+        html = shared_cache.get_render(key)
+        if html is not None:
+            render_cache.put(key, html)
+    if html is None:
+        html = markdown(body, extensions=list(MARKDOWN_EXTENSIONS))
+        html = render_latex_in_html(html, convert_to_mathml=convert_latex_to_mathml)
+        render_cache.put(key, html)
+        if shared_cache is not None:
+            shared_cache.put_render(key, html)
+    return html
+
+def parse_time(meta):
+    """解析 meta.time，缺失时视为 1970-01-01，格式错误返回 None"""
+    t_str = meta.get("time", "1970-01-01 00:00:00")
+    try:
+        return datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
+    except:
+        return None
+
+def view_cutoff():
+    """返回可见天数限制对应的最早时间（epoch 秒），无限制时返回 None"""
+    if VIEW_LIMIT < 0:
+        return None
+    return math.ceil((datetime.now() - timedelta(days=VIEW_LIMIT)).timestamp())
+
+def is_visible(entry, cutoff):
+    """条目是否在可见天数内；时间格式错误的条目始终可见（向后兼容）"""
+    return cutoff is None or not entry["time_ok"] or entry["ts"] >= cutoff
+
+# 生成摘要时去掉的 Markdown 语法：代码块、图片、链接地址、HTML 标签、标题/引用/列表标记、强调符号
+EXCERPT_RULES = [
+    (re.compile(r"```.*?```", re.DOTALL), " "),
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"<[^>]+>"), ""),
+    (re.compile(r"^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+", re.MULTILINE), ""),
+    (re.compile(r"[*`~]+"), ""),
+]
+
+def make_excerpt(body, length=None):
+    """直接从 Markdown 源文本生成纯文本摘要（不渲染）"""
+    length = length or CACHE_CONFIG.get("excerpt_length", 120)
+    text = body or ""
+    for pattern, repl in EXCERPT_RULES:
+        text = pattern.sub(repl, text)
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= length:
+        return text
+    return text[:length].rstrip() + "…"
+
+ITEM_FIELDS = ("filename", "meta", "raw", "html", "excerpt")
+
+def requested_fields():
+    """解析 fields 参数（如 meta,filename,excerpt），未提供时返回 None 表示完整输出，含未知字段时抛出 ValueError"""
+    raw = request.args.get("fields")
+    if not raw:
+        return None
+    fields = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = fields - set(ITEM_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {','.join(sorted(unknown))}, allowed: {','.join(ITEM_FIELDS)}")
+    return fields
+
+def encode_cursor(entry):
+    """把条目的排序键 (time, filename) 编码为不透明的分页游标"""
+    key = [entry["dt"].strftime("%Y-%m-%d %H:%M:%S"), entry["filename"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """解析分页游标，返回排序键 (epoch 秒, filename)，格式错误抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        t_str, filename = json.loads(raw.decode("utf-8"))
+        return (int(datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S").timestamp()), str(filename))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+# ----------------------内容目录缓存----------------------
+class PackStore:
+    """内容目录下的月度打包文件：<folder>/packs/YYYY-MM.pack 存放首尾相接的文件原文，
+    YYYY-MM.idx 记录每个文件在 .pack 中的 (偏移, 长度, 原修改时间)
+
+    .pack 只追加写入，读取通过 mmap；编辑或删除已打包的文件时只从 .idx 中移除记录（编辑后的内容写回普通文件），
+    .idx 整体原子替换。打包条目的签名沿用原文件的 (size, mtime_ns)，打包前后解析和渲染缓存保持有效
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, "packs")
+        self._packs = {}  # 月份 -> {"sig": .idx 的 (size, mtime_ns), "files": {文件名: [偏移, 长度, mtime_ns]}, "mm": mmap}
+        self._where = {}  # 文件名 -> 月份
+        self._dir_sig = None
+        self._lock = threading.RLock()
+
+    def _idx_path(self, month):
+        return os.path.join(self.path, f"{month}.idx")
+
+    def _pack_path(self, month):
+        return os.path.join(self.path, f"{month}.pack")
+
+    def scan(self):
+        """重新加载有变化的 .idx；目录本身未变化时只需一次 stat
+
+        目录修改时间精度有限，最近 2 秒内修改过的目录每次都完整检查
+        """
+        try:
+            st = os.stat(self.path)
+            dir_sig = (st.st_mtime_ns, st.st_ino)
+        except OSError:
+            dir_sig = None
+        with self._lock:
+            if dir_sig == self._dir_sig and (dir_sig is None or time.time_ns() - dir_sig[0] > 2_000_000_000):
+                return
+            self._dir_sig = dir_sig
+            months = set()
+            if dir_sig is not None:
+                for name in os.listdir(self.path):
+                    if not name.endswith(".idx"):
+                        continue
+                    month = name[:-4]
+                    months.add(month)
+                    try:
+                        st = os.stat(self._idx_path(month))
+                    except OSError:
+                        continue
+                    sig = (st.st_size, st.st_mtime_ns)
+                    pack = self._packs.get(month)
+                    if pack is not None and pack["sig"] == sig:
+                        continue
+                    try:
+                        with open(self._idx_path(month), "r", encoding="utf-8") as f:
+                            files = json.load(f)["files"]
+                    except Exception as e:
+                        logger.warning("pack index load error folder=%s month=%s error=%s", self.folder, month, e)
+                        continue
+                    self._close(month)
+                    self._packs[month] = {"sig": sig, "files": files, "mm": None}
+            for month in [m for m in self._packs if m not in months]:
+                self._close(month)
+                del self._packs[month]
+            self._where = {name: month for month, pack in self._packs.items() for name in pack["files"]}
+
+    def _close(self, month):
+        pack = self._packs.get(month)
+        if pack is not None and pack["mm"] is not None:
+            pack["mm"].close()
+            pack["mm"] = None
+
+    def sigs(self):
+        """返回所有已打包文件的签名 {文件名: (size, mtime_ns)}"""
+        self.scan()
+        with self._lock:
+            return {name: (rec[1], rec[2]) for pack in self._packs.values() for name, rec in pack["files"].items()}
+
+    def sig(self, filename):
+        """返回已打包文件的签名，不在打包文件中时返回 None"""
+        self.scan()
+        with self._lock:
+            month = self._where.get(filename)
+            if month is None:
+                return None
+            rec = self._packs[month]["files"][filename]
+            return (rec[1], rec[2])
+
+    def read(self, filename):
+        """通过 mmap 读取已打包文件的原文（与文本模式读取普通文件一样统一换行符），不存在时抛出 FileNotFoundError"""
+        self.scan()
+        with self._lock:
+            month = self._where.get(filename)
+            if month is None:
+                raise FileNotFoundError(os.path.join(self.folder, filename))
+            pack = self._packs[month]
+            offset, length, _ = pack["files"][filename]
+            if length == 0:
+                return ""
+            mm = pack["mm"]
+            if mm is None or len(mm) < offset + length:
+                # 首次读取或 .pack 追加后重新映射
+                self._close(month)
+                with open(self._pack_path(month), "rb") as f:
+                    mm = pack["mm"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = mm[offset:offset + length]
+        return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+    def _write_index(self, month, files):
+        path = self._idx_path(month)
+        if not files:
+            # 月份内的文件都已移除，删除整个打包文件
+            self._close(month)
+            for p in (path, self._pack_path(month)):
+                if os.path.exists(p):
+                    os.remove(p)
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def discard(self, filename):
+        """从打包文件中移除一个文件（.pack 中的原文保留，直到整个月份被清空），返回是否移除"""
+        self.scan()
+        with self._lock:
+            month = self._where.get(filename)
+            if month is None:
+                return False
+            files = dict(self._packs[month]["files"])
+            del files[filename]
+            self._write_index(month, files)
+            self._dir_sig = None
+            self.scan()
+        logger.info("pack discard folder=%s month=%s file=%s", self.folder, month, filename)
+        return True
 
-    html = markdown(body, extensions=["extra", "codehilite"])
-    # 处理 LaTeX 公式
-    html = render_latex_in_html(html, convert_to_mathml=convert_latex_to_mathml)
+    def append(self, month, items):
+        """把 [(文件名, 原文字节, mtime_ns)] 追加到月份打包文件，写入并同步 .pack 后再替换 .idx"""
+        self.scan()
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            pack = self._packs.get(month)
+            files = dict(pack["files"]) if pack is not None else {}
+            with open(self._pack_path(month), "ab") as f:
+                offset = f.tell()
+                for filename, data, mtime_ns in items:
+                    f.write(data)
+                    files[filename] = [offset, len(data), mtime_ns]
+                    offset += len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_index(month, files)
+            self._dir_sig = None
+            self.scan()
+
+_pack_stores = {}
+
+def pack_store(folder):
+    """返回内容目录对应的 PackStore（每个目录一个）"""
+    store = _pack_stores.get(folder)
+    if store is None:
+        store = _pack_stores.setdefault(folder, PackStore(folder))
+    return store
+
+def read_text(folder, filename):
+    """读取文件原文；普通文件不存在时从月度打包文件中读取"""
+    try:
+        with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return pack_store(folder).read(filename)
+
+def read_entry(folder, filename, sig):
+    """读取并解析单个文件，返回目录条目"""
+    text = read_text(folder, filename)
+    meta, body = parse_front_matter(text)
+    return make_entry(filename, sig, text, meta, body)
+
+def make_entry(filename, sig, text, meta, body, digest=None, excerpt=None):
+    """由文件内容和解析出的前置信息生成目录条目，digest / excerpt 已知时直接使用"""
+    dt = parse_time(meta)
+    # 日期索引的键：文件名日期与 meta.time 日期一致时才参与按日期查询，时间格式错误的条目不进入索引
+    day = filename[:10]
+    t_str = meta.get("time", "")
+    if dt is None or not isinstance(t_str, str) or not t_str.startswith(day):
+        day = None
     return {
+        "filename": filename,
+        "sig": sig,
         "meta": meta,
-        "html": html,
+        "body": body,
         "raw": text,
-        "filename": os.path.basename(filepath)
+        "digest": digest or body_digest(body),
+        "excerpt": make_excerpt(body) if excerpt is None else excerpt,
+        # 时间格式错误的条目按 1970-01-01 排序，但不受可见天数限制（向后兼容）
+        "dt": dt or datetime(1970, 1, 1),
+        "ts": int((dt or datetime(1970, 1, 1)).timestamp()),
+        "time_ok": dt is not None,
+        "day": day
     }
 
+class LazyEntry(dict):
+    """由元数据旁路文件还原的目录条目：不含 raw / body，首次访问时才从 .md 文件或打包文件读取
+
+    offset 为正文在原文中的起始位置
+    """
+
+    def __init__(self, folder, offset, entry):
+        super().__init__(entry)
+        self.folder = folder
+        self.offset = offset
+
+    def __missing__(self, key):
+        if key not in ("raw", "body"):
+            raise KeyError(key)
+        try:
+            text = read_text(self.folder, self["filename"])
+        except Exception as e:
+            # 文件刚被删除或移入打包文件，目录下次扫描时会更新条目
+            logger.warning("catalog lazy read error folder=%s file=%s error=%s", self.folder, self["filename"], e)
+            return ""
+        body = text[self.offset:]
+        digest = body_digest(body)
+        if digest != self["digest"]:
+            # 还原后文件又被修改（目录下次扫描时会重新解析），渲染缓存键跟随实际读到的正文
+            self["digest"] = digest
+        self["raw"], self["body"] = text, body
+        return self[key]
+
+def _build_chunk(args):
+    """冷启动构建的工作进程任务：解析一批文件，并预先渲染两种 LaTeX 模式的 HTML 和搜索用纯文本
+
+    返回 [(文件名, 条目或 None, {是否转换 LaTeX: html}, 错误信息)]
+    """
+    folder, files, prerender = args
+    results = []
+    for filename, sig in files:
+        try:
+            entry = read_entry(folder, filename, sig)
+            rendered = {}
+            if prerender:
+                for convert in (True, False):
+                    rendered[convert] = render_markdown(entry["body"], convert_latex_to_mathml=convert,
+                                                        digest=entry["digest"])
+                entry["plain"] = strip_html(rendered[False])
+            results.append((filename, entry, rendered, None))
+        except Exception as e:
+            results.append((filename, None, {}, str(e)))
+    return results
+
+class ContentCatalog:
+    """进程内的内容目录，缓存 posts/ 或 status/ 下每个文件的解析结果，渲染结果走 render_cache
+
+    通过每个文件的 (size, mtime_ns) 判断是否变化，只重新解析变化的文件；
+    通过接口写入的文件调用 touch() 立即生效，外部修改最多延迟 scan_interval 秒被发现
+
+    每个文件的时间只在读取时解析一次（epoch 秒），排序键 (ts, filename) 列表随增删增量维护，
+    可见天数限制通过二分查找切分，不逐条比较
+    """
+
+    def __init__(self, folder, scan_interval=1.0):
+        self.folder = folder
+        self.scan_interval = scan_interval
+        # 已归档到月度打包文件中的条目，与普通文件一起对外提供
+        self.packs = pack_store(folder)
+        self._entries = {}
+        self._sorted = None
+        # 升序的排序键 (ts, filename)，随条目增删用二分插入/删除维护
+        self._keys = []
+        # 时间格式错误的条目的排序键（始终可见，排在最旧的位置）
+        self._untimed = []
+        # 日期索引：升序的日期列表 + 日期 -> 当天条目排序键 (dt, filename) 升序列表
+        self._days = []
+        self._by_day = {}
+        # 进入日期索引的全部条目的 (day, ts, filename) 升序列表，日期区间查询直接二分切片
+        self._day_keys = []
+        self._last_scan = None
+        self._building = False
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """注册变更回调 callback(event, catalog, filename)，event 为 created / edited / removed
+
+        回调在目录锁内同步调用，应当只做轻量的标记工作
+        """
+        self._listeners.append(callback)
+
+    def _index_day(self, entry, add):
+        """在日期索引中加入或移除条目"""
+        day = entry["day"]
+        if day is None:
+            return
+        key = (entry["ts"], entry["filename"])
+        keys = self._by_day.get(day)
+        if add:
+            if keys is None:
+                keys = self._by_day[day] = []
+                bisect.insort(self._days, day)
+            bisect.insort(keys, key)
+            bisect.insort(self._day_keys, (day,) + key)
+        elif keys is not None:
+            self._remove_key(keys, key)
+            self._remove_key(self._day_keys, (day,) + key)
+            if not keys:
+                del self._by_day[day]
+                del self._days[bisect.bisect_left(self._days, day)]
+
+    @staticmethod
+    def _remove_key(keys, key):
+        idx = bisect.bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+
+    def _index(self, entry, add):
+        """在排序键列表和日期索引中加入或移除条目"""
+        key = (entry["ts"], entry["filename"])
+        lists = [self._keys] if entry["time_ok"] else [self._keys, self._untimed]
+        for keys in lists:
+            if add:
+                bisect.insort(keys, key)
+            else:
+                self._remove_key(keys, key)
+        self._index_day(entry, add)
+
+    def _set(self, filename, entry):
+        """更新或移除单个条目，并通知监听者"""
+        old = self._entries.pop(filename, None)
+        if old is not None:
+            self._index(old, add=False)
+        if entry is None:
+            if old is None:
+                return
+            event = "removed"
+        else:
+            self._entries[filename] = entry
+            self._index(entry, add=True)
+            event = "created" if old is None else "edited"
+        self._sorted = None
+        for callback in self._listeners:
+            try:
+                callback(event, self, filename)
+            except Exception as e:
+                logger.warning("catalog listener error folder=%s file=%s error=%s", self.folder, filename, e)
+
+    def _read(self, filename, sig):
+        """读取并解析单个文件，返回目录条目；优先使用元数据旁路文件和其他工作进程（生产模式）已解析的结果"""
+        if metadata_catalog is not None:
+            entry = metadata_catalog.take(self.folder, filename, sig)
+            if entry is not None:
+                return entry
+        if shared_cache is not None:
+            entry = shared_cache.get_entry(self.folder, filename, sig)
+            if entry is not None:
+                return entry
+        entry = read_entry(self.folder, filename, sig)
+        if shared_cache is not None:
+            shared_cache.put_entry(self.folder, entry)
+        return entry
+
+    def _stat_sig(self, filename):
+        try:
+            st = os.stat(os.path.join(self.folder, filename))
+        except OSError:
+            return self.packs.sig(filename)
+        return (st.st_size, st.st_mtime_ns)
+
+    def _scan_files(self):
+        """返回目录中所有文件的签名 {文件名: (size, mtime_ns)}，同名时普通文件优先于打包文件"""
+        files = {}
+        if os.path.isdir(self.folder):
+            with os.scandir(self.folder) as it:
+                for de in it:
+                    if not de.name.endswith(".md") or not de.is_file():
+                        continue
+                    st = de.stat()
+                    files[de.name] = (st.st_size, st.st_mtime_ns)
+        for name, sig in self.packs.sigs().items():
+            files.setdefault(name, sig)
+        return files
+
+    def refresh(self, force=False):
+        """扫描目录，重新解析有变化的文件，移除已删除的文件"""
+        now = time.monotonic()
+        if not force and self._last_scan is not None and now - self._last_scan < self.scan_interval:
+            return
+        if not force and self._building:
+            # 冷启动构建期间由 build() 写入条目，请求不再串行扫描
+            return
+        with self._lock:
+            seen = self._scan_files()
+            changed = 0
+            for name, sig in seen.items():
+                old = self._entries.get(name)
+                if old is not None and old["sig"] == sig:
+                    continue
+                try:
+                    self._set(name, self._read(name, sig))
+                    changed += 1
+                except Exception as e:
+                    logger.warning("catalog load error folder=%s file=%s error=%s", self.folder, name, e)
+            for name in [n for n in self._entries if n not in seen]:
+                self._set(name, None)
+                changed += 1
+            if changed:
+                logger.info("catalog refresh folder=%s changed=%s total=%s", self.folder, changed, len(self._entries))
+            self._last_scan = now
+
+    def build(self, workers=0, prerender=True, min_files=200):
+        """冷启动构建：把需要读取的文件分批交给进程池并行解析和渲染，完成一批就写入目录并记录进度
+
+        文件数少于 min_files 或只有一个工作进程时直接串行 refresh()；构建结束后再 refresh 一次，
+        补上构建期间变化的文件。
+
+        元数据旁路文件和共享缓存（生产模式）中已有的条目直接还原；生产模式下各工作进程通过构建锁排队，
+        只有一个进程启动进程池，其余进程等待后直接使用它写入共享缓存的结果
+        """
+        start = time.time()
+        todo = self._restore(self._scan_files().items())
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(todo) < min_files:
+            self.refresh(force=True)
+            return
+
+        self._building = True
+        done = 0
+        try:
+            with shared_cache.build_lock() if shared_cache is not None else contextlib.nullcontext():
+                if shared_cache is not None:
+                    # 等待构建锁期间其他工作进程可能已经构建完成
+                    todo = self._restore(todo)
+                if len(todo) >= min_files:
+                    done = self._build_pool(todo, workers, prerender)
+        except Exception as e:
+            logger.error("catalog build error folder=%s error=%s, falling back to serial load", self.folder, e)
+        finally:
+            self._building = False
+        # 移除已删除的文件，并补上构建期间变化或构建失败的文件
+        self.refresh(force=True)
+        logger.info("catalog build folder=%s files=%s workers=%s dur=%.1fms",
+                    self.folder, done, workers, (time.time() - start) * 1000.0)
+
+    def _restore(self, files):
+        """把旁路文件或共享缓存中签名一致的条目直接写入目录，返回仍需读取的 [(文件名, 签名)]"""
+        todo = []
+        for name, sig in files:
+            old = self.peek(name)
+            if old is not None and old["sig"] == sig:
+                continue
+            entry = metadata_catalog.take(self.folder, name, sig) if metadata_catalog is not None else None
+            if entry is None and shared_cache is not None:
+                entry = shared_cache.get_entry(self.folder, name, sig)
+            if entry is not None:
+                with self._lock:
+                    self._set(name, entry)
+            else:
+                todo.append((name, sig))
+        return todo
+
+    def _build_pool(self, todo, workers, prerender):
+        """用进程池解析和渲染 todo 中的文件，结果写入目录和渲染缓存（生产模式下同时写入共享缓存），返回处理的文件数"""
+        done = 0
+        step = max(1, len(todo) // 10)
+        size = max(1, math.ceil(len(todo) / (workers * 4)))
+        chunks = [(self.folder, todo[i:i + size], prerender) for i in range(0, len(todo), size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as ex:
+            futures = [ex.submit(_build_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                results = future.result()
+                for filename, entry, rendered, error in results:
+                    if entry is None:
+                        logger.warning("catalog load error folder=%s file=%s error=%s", self.folder, filename, error)
+                        continue
+                    for convert, html in rendered.items():
+                        key = (entry["digest"], convert, MARKDOWN_EXTENSIONS)
+                        render_cache.put(key, html)
+                        if shared_cache is not None:
+                            shared_cache.put_render(key, html)
+                    if shared_cache is not None:
+                        shared_cache.put_entry(self.folder, entry)
+                    with self._lock:
+                        self._set(filename, entry)
+                before, done = done, done + len(results)
+                if done // step != before // step or done == len(todo):
+                    logger.info("catalog build folder=%s progress=%s/%s", self.folder, done, len(todo))
+        return done
+
+    def touch(self, filename):
+        """文件被接口写入或删除后调用，立即同步该文件的条目"""
+        with self._lock:
+            sig = self._stat_sig(filename)
+            self._set(filename, None if sig is None else self._read(filename, sig))
+
+    def get(self, filename):
+        """按文件名获取条目，不存在返回 None"""
+        if not filename or os.path.basename(filename) != filename or not filename.endswith(".md"):
+            return None
+        with self._lock:
+            sig = self._stat_sig(filename)
+            old = self._entries.get(filename)
+            if sig is None:
+                if old is not None:
+                    self.touch(filename)
+                return None
+            if old is None or old["sig"] != sig:
+                self.touch(filename)
+            return self._entries.get(filename)
+
+    def _ensure_sorted(self):
+        # 排序键已有序，这里只需按倒序取出条目，不再排序
+        if self._sorted is None:
+            self._sorted = [self._entries[k[1]] for k in reversed(self._keys)]
+
+    def _cut(self, cutoff):
+        """返回第一个不早于 cutoff 的排序键位置"""
+        return 0 if cutoff is None else bisect.bisect_left(self._keys, (cutoff, ""))
+
+    def _untimed_before(self, bound):
+        """返回排序键小于 bound 的时间格式错误条目（倒序）"""
+        idx = bisect.bisect_left(self._untimed, bound)
+        return [self._entries[k[1]] for k in reversed(self._untimed[:idx])]
+
+    def entries(self):
+        """返回所有条目，按 (时间, 文件名) 倒序（最新在前）"""
+        self.refresh()
+        with self._lock:
+            self._ensure_sorted()
+            return self._sorted
+
+    def visible(self, cutoff=None):
+        """返回可见条目，按 (时间, 文件名) 倒序；可见天数限制通过二分查找切分"""
+        self.refresh()
+        with self._lock:
+            self._ensure_sorted()
+            entries = self._sorted[:len(self._keys) - self._cut(cutoff)]
+            if cutoff is not None and self._untimed:
+                entries = entries + self._untimed_before((cutoff, ""))
+            return entries
+
+    def next_expiry(self, cutoff=None):
+        """返回最早一个可见且会过期的条目的时间（epoch 秒），可见时间下限超过它时可见集合会变化；不会过期时返回 None"""
+        if cutoff is None:
+            return None
+        self.refresh()
+        with self._lock:
+            cut = self._cut(cutoff)
+            return self._keys[cut][0] if cut < len(self._keys) else None
+
+    def last_expired(self, cutoff=None):
+        """返回最近一个超出可见天数的条目的时间（epoch 秒），没有时返回 None"""
+        if cutoff is None:
+            return None
+        self.refresh()
+        with self._lock:
+            cut = self._cut(cutoff)
+            return self._keys[cut - 1][0] if cut > 0 else None
+
+    def latest(self, cutoff=None):
+        """返回最新的一个可见条目，没有时返回 None"""
+        self.refresh()
+        with self._lock:
+            if not self._keys:
+                return None
+            if cutoff is None or self._keys[-1][0] >= cutoff:
+                return self._entries[self._keys[-1][1]]
+            # 其余条目都早于可见时间下限，只剩时间格式错误的条目可见
+            return self._entries[self._untimed[-1][1]] if self._untimed else None
+
+    def page(self, after=None, limit=20, cutoff=None):
+        """keyset 分页：返回排序键在 after 之后（更旧）的最多 limit 个可见条目
+
+        Args:
+            after: 上一页最后一条的排序键 (epoch 秒, filename)，None 表示从最新开始
+            limit: 每页数量
+            cutoff: 可见时间下限（epoch 秒），早于它的条目被跳过
+        返回: (条目列表, 是否还有下一页)
+        """
+        self.refresh()
+        with self._lock:
+            keys = self._keys
+            cut = self._cut(cutoff)
+            idx = len(keys) if after is None else bisect.bisect_left(keys, after)
+            # 可见区间 [cut, idx) 中最新的 limit + 1 条，多取一条用来判断是否还有下一页
+            page = [self._entries[k[1]] for k in reversed(keys[max(cut, idx - limit - 1):idx])]
+            if len(page) <= limit and cutoff is not None and self._untimed:
+                # 可见区间已取完，继续取早于下限但始终可见的时间格式错误条目
+                bound = min(after, (cutoff, "")) if after else (cutoff, "")
+                page += self._untimed_before(bound)[:limit + 1 - len(page)]
+        return page[:limit], len(page) > limit
+
+    def day_range(self, start=None, end=None, offset=0, limit=20, cutoff=None):
+        """按日期区间 [start, end]（YYYY-MM-DD，闭区间，可省略任一端）查询，按时间倒序分页
+
+        区间边界和总数都由 (day, ts, filename) 排序键二分得到，只取出当前页的条目，不遍历区间内的日期
+        返回: (区间内可见条目总数, 当前页条目列表)
+        """
+        self.refresh()
+        with self._lock:
+            keys = self._day_keys
+            lo = bisect.bisect_left(keys, (start,)) if start else 0
+            hi = bisect.bisect_right(keys, (end, math.inf)) if end else len(keys)
+            if cutoff is not None:
+                # 条目的日期与时间一致，可见时间下限当天之前的日期和当天更早的条目一起跳过
+                cut_day = datetime.fromtimestamp(cutoff).strftime("%Y-%m-%d")
+                lo = max(lo, bisect.bisect_left(keys, (cut_day, cutoff)))
+            total = max(0, hi - lo)
+            top = hi - offset
+            page = [self._entries[k[2]] for k in reversed(keys[max(lo, top - limit):max(lo, top)])]
+        return total, page
+
+    def day_counts(self, start=None, end=None, cutoff=None):
+        """按日期区间 [start, end]（YYYY-MM-DD，闭区间，可省略任一端）统计每天的可见条目数
+
+        直接读取日期索引中每天的条目数，不读取条目本身
+        返回: [(日期, 数量), ...]，按日期升序，不含没有条目的日期
+        """
+        self.refresh()
+        with self._lock:
+            days = self._days
+            lo = bisect.bisect_left(days, start) if start else 0
+            hi = bisect.bisect_right(days, end) if end else len(days)
+            cut_day = None
+            if cutoff is not None:
+                cut_day = datetime.fromtimestamp(cutoff).strftime("%Y-%m-%d")
+                lo = max(lo, bisect.bisect_left(days, cut_day))
+            counts = []
+            for day in days[lo:hi]:
+                keys = self._by_day[day]
+                n = len(keys)
+                if day == cut_day:
+                    n -= bisect.bisect_left(keys, (cutoff, ""))
+                if n:
+                    counts.append((day, n))
+        return counts
+
+    def day_first_meta(self, day, field, cutoff=None):
+        """返回某天可见条目中时间最早的非空 meta[field]（如当天状态的图标），没有时返回 None"""
+        with self._lock:
+            keys = self._by_day.get(day, ())
+            start = bisect.bisect_left(keys, (cutoff, "")) if cutoff is not None else 0
+            for _, filename in keys[start:]:
+                value = self._entries[filename]["meta"].get(field)
+                if value:
+                    return value
+        return None
+
+    @property
+    def loaded(self):
+        """是否已完成过一次完整扫描"""
+        return self._last_scan is not None
+
+    def peek(self, filename):
+        """按文件名直接取缓存中的条目，不检查磁盘"""
+        with self._lock:
+            return self._entries.get(filename)
+
+    def plain(self, entry):
+        """返回条目正文的纯文本（不转换 LaTeX），用于搜索，结果缓存在条目上"""
+        text = entry.get("plain")
+        if text is None:
+            text = strip_html(render_markdown(entry["body"], convert_latex_to_mathml=False,
+                                              digest=entry["digest"]))
+            entry["plain"] = text
+        return text
+
+    def count_visible(self, cutoff=None):
+        """统计可见条目数量"""
+        self.refresh()
+        with self._lock:
+            cut = self._cut(cutoff)
+            count = len(self._keys) - cut
+            if cutoff is not None and self._untimed:
+                count += bisect.bisect_left(self._untimed, (cutoff, ""))
+            return count
+
+    def filenames(self):
+        """返回当前所有文件名"""
+        self.refresh()
+        with self._lock:
+            return list(self._entries)
+
+    def project(self, entry, fields=None, convert_latex_to_mathml=True):
+        """按 fields 返回条目的部分字段，只有请求 html 时才渲染 Markdown；fields 为 None 时返回完整输出"""
+        if fields is None:
+            return self.render(entry, convert_latex_to_mathml=convert_latex_to_mathml)
+        item = {}
+        if "filename" in fields:
+            item["filename"] = entry["filename"]
+        if "meta" in fields:
+            item["meta"] = dict(entry["meta"])
+        if "raw" in fields:
+            item["raw"] = entry["raw"]
+        if "excerpt" in fields:
+            item["excerpt"] = entry["excerpt"]
+        if "html" in fields:
+            item["html"] = render_markdown(entry["body"], convert_latex_to_mathml=convert_latex_to_mathml,
+                                           digest=entry["digest"])
+        return item
+
+    def render(self, entry, convert_latex_to_mathml=True):
+        """返回条目的接口输出字典"""
+        html = render_markdown(entry["body"], convert_latex_to_mathml=convert_latex_to_mathml,
+                               digest=entry["digest"])
+        return {
+            "filename": entry["filename"],
+            "meta": dict(entry["meta"]),
+            "raw": entry["raw"],
+            "html": html
+        }
+
+post_catalog = ContentCatalog("posts", scan_interval=CACHE_CONFIG.get("scan_interval", 1.0))
+status_catalog = ContentCatalog("status", scan_interval=CACHE_CONFIG.get("scan_interval", 1.0))
+CATALOGS = {"posts": post_catalog, "status": status_catalog}
+
+def _json_safe(value):
+    """值能否原样写入 JSON 再读回（YAML 中的日期等类型不能）"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return True
+    if isinstance(value, list):
+        return all(_json_safe(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _json_safe(v) for k, v in value.items())
+    return False
+
+class MetadataCatalog:
+    """内容目录的元数据旁路文件：文件名 -> (大小, 修改时间, 前置信息, 正文 sha1, 摘要, 正文起始位置)
+
+    重启时文件大小和修改时间未变的条目直接由旁路文件还原，不再打开和解析 .md 文件；
+    旁路文件不保存原文，还原的条目在首次需要原文或正文时才读取文件（见 LazyEntry）。
+    目录变化后延迟写回，写入方式与搜索索引相同（临时文件 + 原子替换）
+    """
+
+    VERSION = 2
+
+    def __init__(self, path, catalogs, save_delay=5.0):
+        self.path = path
+        self.catalogs = catalogs  # {"posts": post_catalog, "status": status_catalog}
+        self.save_delay = save_delay
+        self._records = {}  # 文件夹 -> {文件名: 记录}，条目被还原后移除
+        self._saved = None  # 上次写入时各文件的签名，没有变化时不再写入
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self._dirty = False
+        self._load()
+        for catalog in catalogs.values():
+            catalog.add_listener(self.on_change)
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION or data.get("excerpt_length") != CACHE_CONFIG.get("excerpt_length", 120):
+                logger.info("metadata catalog version mismatch, rebuilding path=%s", self.path)
+                return
+            self._records = {folder: data.get("files", {}).get(folder, {}) for folder in self.catalogs}
+            self._saved = {folder: {name: tuple(r["sig"]) for name, r in records.items()}
+                           for folder, records in self._records.items()}
+            logger.info("metadata catalog loaded path=%s files=%s", self.path,
+                        sum(len(r) for r in self._records.values()))
+        except Exception as e:
+            logger.warning("metadata catalog load error path=%s error=%s", self.path, e)
+            self._records = {}
+
+    def take(self, folder, filename, sig):
+        """取出文件签名一致的条目，没有或已过期时返回 None"""
+        with self._lock:
+            record = self._records.get(folder, {}).pop(filename, None)
+        if record is None or tuple(record["sig"]) != sig:
+            return None
+        entry = make_entry(filename, sig, None, record["meta"], None,
+                           digest=record["digest"], excerpt=record["excerpt"])
+        del entry["raw"], entry["body"]
+        return LazyEntry(folder, record["body"], entry)
+
+    def on_change(self, event, catalog, filename):
+        """目录变更回调：延迟写回"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.save)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def save(self):
+        """把各目录当前的条目原子地写入旁路文件，目录没有变化或与上次写入相同时跳过"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        files = {}
+        sigs = {}
+        for folder, catalog in self.catalogs.items():
+            records = files[folder] = {}
+            for entry in catalog.entries():
+                if not _json_safe(entry["meta"]):
+                    continue
+                # 尚未读取原文的条目直接沿用还原时的正文起始位置
+                offset = entry.offset if "raw" not in entry else len(entry["raw"]) - len(entry["body"])
+                records[entry["filename"]] = {
+                    "sig": list(entry["sig"]),
+                    "body": offset,
+                    "meta": entry["meta"],
+                    "digest": entry["digest"],
+                    "excerpt": entry["excerpt"],
+                }
+            sigs[folder] = {name: tuple(r["sig"]) for name, r in records.items()}
+        if sigs == self._saved:
+            return
+        data = {"version": self.VERSION, "excerpt_length": CACHE_CONFIG.get("excerpt_length", 120), "files": files}
+        try:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            # 生产模式下多个工作进程可能同时写入，临时文件按进程区分
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._saved = sigs
+            logger.info("metadata catalog saved path=%s files=%s", self.path, sum(len(r) for r in files.values()))
+        except Exception as e:
+            logger.warning("metadata catalog save error path=%s error=%s", self.path, e)
+
+metadata_catalog = None
+if not WORKER_PROCESS and CACHE_CONFIG.get("metadata_path", "cache/metadata.json"):
+    metadata_catalog = MetadataCatalog(CACHE_CONFIG.get("metadata_path", "cache/metadata.json"), CATALOGS)
+    atexit.register(metadata_catalog.save)
+
+def entry_tags(meta):
+    """返回 meta.tags 中去重后的标签列表，兼容单个字符串写法"""
+    tags = meta.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    if not isinstance(tags, list):
+        return []
+    return sorted({str(t).strip() for t in tags if str(t).strip()})
+
+class TagIndex:
+    """标签索引：标签 -> 该标签下条目的排序键 (ts, filename) 升序列表
+
+    注册为目录的变更监听者，发布/编辑/删除或磁盘变化时增量更新，按标签取动态只需访问该标签下的条目；
+    时间格式错误的条目（始终可见）单独记录，可见数量通过二分查找计算
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._postings = {}
+        # 时间格式错误的条目的排序键，与 ContentCatalog._untimed 相同
+        self._untimed = {}
+        self._docs = {}  # filename -> (排序键, 标签列表, 时间是否有效)
+        self._lock = threading.Lock()
+        catalog.add_listener(self.on_change)
+
+    def on_change(self, event, catalog, filename):
+        entry = catalog.peek(filename) if event != "removed" else None
+        with self._lock:
+            old = self._docs.pop(filename, None)
+            if old is not None:
+                key, tags, time_ok = old
+                postings = self._postings if time_ok else self._untimed
+                for tag in tags:
+                    keys = postings[tag]
+                    idx = bisect.bisect_left(keys, key)
+                    if idx < len(keys) and keys[idx] == key:
+                        del keys[idx]
+                    if not keys:
+                        del postings[tag]
+            if entry is not None:
+                key, tags, time_ok = (entry["ts"], filename), entry_tags(entry["meta"]), entry["time_ok"]
+                postings = self._postings if time_ok else self._untimed
+                for tag in tags:
+                    bisect.insort(postings.setdefault(tag, []), key)
+                self._docs[filename] = (key, tags, time_ok)
+
+    def keys(self, tag):
+        """返回标签下的排序键（升序）副本"""
+        with self._lock:
+            return list(heapq.merge(self._untimed.get(tag, ()), self._postings.get(tag, ())))
+
+    def _count(self, tag, cutoff):
+        keys = self._postings.get(tag, ())
+        count = len(self._untimed.get(tag, ()))
+        if cutoff is None:
+            return count + len(keys)
+        return count + len(keys) - bisect.bisect_left(keys, (cutoff, ""))
+
+    def count(self, tag, cutoff=None):
+        """返回标签下可见条目数"""
+        with self._lock:
+            return self._count(tag, cutoff)
+
+    def counts(self, cutoff=None):
+        """返回 [(标签, 可见条目数)]，按数量倒序、标签名升序"""
+        with self._lock:
+            result = [(tag, self._count(tag, cutoff)) for tag in self._postings.keys() | self._untimed.keys()]
+        result = [(tag, count) for tag, count in result if count]
+        result.sort(key=lambda x: (-x[1], x[0]))
+        return result
+
+    def view(self, tag):
+        return TagView(self, tag)
+
+class TagView:
+    """单个标签下的动态，提供与 ContentCatalog 相同的 visible / page / count_visible / project 接口"""
+
+    def __init__(self, index, tag):
+        self.index = index
+        self.catalog = index.catalog
+        self.tag = tag
+
+    def _iter_visible(self, keys, cutoff):
+        for k in reversed(keys):
+            e = self.catalog.peek(k[1])
+            if e is not None and is_visible(e, cutoff):
+                yield e
+
+    def visible(self, cutoff=None):
+        return list(self._iter_visible(self.index.keys(self.tag), cutoff))
+
+    def count_visible(self, cutoff=None):
+        return self.index.count(self.tag, cutoff)
+
+    def page(self, after=None, limit=20, cutoff=None):
+        keys = self.index.keys(self.tag)
+        if after is not None:
+            keys = keys[:bisect.bisect_left(keys, after)]
+        page = []
+        for e in self._iter_visible(keys, cutoff):
+            page.append(e)
+            if len(page) > limit:
+                break
+        return page[:limit], len(page) > limit
+
+    def project(self, entry, fields=None, convert_latex_to_mathml=True):
+        return self.catalog.project(entry, fields, convert_latex_to_mathml=convert_latex_to_mathml)
+
+tag_index = TagIndex(post_catalog)
+
+class ContentGeneration:
+    """内容版本号：内容（接口写入或磁盘变化）或配置发生变化时递增，用于生成 ETag / Last-Modified
+
+    生产模式下版本号取共享缓存中的变更序号，所有工作进程一致；sync() 把其他进程记录的变更同步到本进程
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.modified = time.time()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._seen = None
+
+    def _advance(self):
+        """更新修改时间（调用方持有 _lock）
+
+        Last-Modified 精确到秒：与上一次修改落在同一秒内时推进到下一秒，
+        否则只带 If-Modified-Since 的客户端在同一秒内先后两次请求会得到过期的 304
+        """
+        now = time.time()
+        self.modified = now if int(now) > int(self.modified) else math.floor(self.modified) + 1
+
+    def bump(self, *args):
+        """可直接作为目录变更监听者 (event, catalog, filename)；不带参数表示配置变化"""
+        if shared_cache is not None:
+            if args:
+                _, catalog, filename = args
+                entry = catalog.peek(filename)
+                change = (catalog.folder, filename, "%s:%s" % entry["sig"] if entry is not None else "")
+            else:
+                change = ("config", "", str(time.time()))
+            seq = shared_cache.record_change(*change)
+        with self._lock:
+            self.value = max(self.value, seq) if shared_cache is not None else self.value + 1
+            self._advance()
+
+    def sync(self):
+        """生产模式下应用其他工作进程记录的变更：重新读取被修改的文件或配置"""
+        if shared_cache is None:
+            return
+        with self._sync_lock:
+            if self._seen is None:
+                # 首次同步：本进程扫描目录时会直接读到磁盘上的最新状态，不需要逐条同步之前的变更；
+                # 版本号直接取共享的最新序号（与其他进程一致），更早的 since 在本进程中没有墓碑，需要全量同步
+                self._seen = shared_cache.last_change()
+                with self._lock:
+                    if self._seen > self.value:
+                        self.value = self._seen
+                        self._advance()
+                change_log.rebase(self._seen)
+                return
+            for seq, folder, filename in shared_cache.changes_since(self._seen):
+                # 先更新版本号，重新读取文件时产生的事件和变更日志记录在该变更的版本号下
+                with self._lock:
+                    if seq > self.value:
+                        self.value = seq
+                        self._advance()
+                if folder == "config":
+                    reload_config()
+                elif folder in CATALOGS:
+                    # get() 会检查文件状态，只有与本进程的缓存不一致时才重新读取
+                    CATALOGS[folder].get(filename)
+                self._seen = seq
+
+    def snapshot(self):
+        with self._lock:
+            return self.value, self.modified
+
+content_generation = ContentGeneration()
+for _catalog in CATALOGS.values():
+    _catalog.add_listener(content_generation.bump)
+# 区分不同进程启动，避免重启后版本号重新计数导致 ETag 冲突；生产模式下所有工作进程共用同一个
+BOOT_ID = f"{int(time.time()):x}"
+if shared_cache is not None:
+    shared_cache.set_meta("boot_id", BOOT_ID, replace=False)
+    BOOT_ID = shared_cache.get_meta("boot_id")
+
+def refresh_catalogs():
+    """同步其他工作进程的变更，并按扫描间隔检查磁盘"""
+    content_generation.sync()
+    for catalog in CATALOGS.values():
+        catalog.refresh()
+
+class EventBus:
+    """内容变更事件总线：最近的事件保存在环形缓冲区中，供 /api/events 推送和 Last-Event-ID 续传"""
+
+    def __init__(self, buffer_size=256, max_subscribers=32):
+        self._events = deque(maxlen=buffer_size)
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+
+    def on_change(self, event, catalog, filename):
+        """目录变更监听者，把变更转换为事件"""
+        entry = catalog.peek(filename)
+        t = entry["meta"].get("time") if entry is not None else None
+        self.publish(event, {
+            "type": "post" if catalog is post_catalog else "status",
+            "filename": filename,
+            "time": t if isinstance(t, str) else None,
+            "generation": content_generation.snapshot()[0]
+        })
+
+    def publish(self, event, data):
+        with self._cond:
+            self._events.append((self._next_id, event, data))
+            self._next_id += 1
+            self._cond.notify_all()
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._next_id - 1
+
+    def wait(self, last_id, timeout):
+        """返回 id 大于 last_id 的事件，没有新事件时最多等待 timeout 秒
+
+        返回 None 表示 last_id 之后的部分事件已被挤出缓冲区，客户端需要重新拉取全部内容
+        """
+        with self._cond:
+            if self._next_id - 1 <= last_id:
+                self._cond.wait(timeout)
+            if not self._events or self._events[-1][0] <= last_id:
+                return []
+            if self._events[0][0] > last_id + 1:
+                return None
+            return [ev for ev in self._events if ev[0] > last_id]
+
+    def acquire(self):
+        """占用一个订阅名额，达到上限时返回 False"""
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.subscribers -= 1
+
+event_bus = EventBus(buffer_size=EVENTS_CONFIG.get("buffer_size", 256),
+                     max_subscribers=EVENTS_CONFIG.get("max_subscribers", 32))
+for _catalog in CATALOGS.values():
+    _catalog.add_listener(event_bus.on_change)
+
+class ChangeLog:
+    """增量同步的变更日志：每个文件只保留最后一次变更 (版本号, 事件)，删除的文件保留为墓碑
+
+    墓碑数量超过上限时丢弃最旧的墓碑，并把同步下限 floor 提高到被丢弃墓碑的版本号，
+    since 早于 floor 的客户端需要全量同步
+    """
+
+    def __init__(self, max_tombstones=1000):
+        self.max_tombstones = max_tombstones
+        self.floor = 0
+        self._changes = OrderedDict()  # (type, filename) -> (版本号, 事件)，按版本号升序
+        self._tombstones = 0
+        self._lock = threading.Lock()
+
+    def on_change(self, event, catalog, filename):
+        """目录变更监听者"""
+        doc_type = "post" if catalog is post_catalog else "status"
+        gen = content_generation.snapshot()[0]
+        with self._lock:
+            old = self._changes.pop((doc_type, filename), None)
+            if old is not None and old[1] == "removed":
+                self._tombstones -= 1
+            self._changes[(doc_type, filename)] = (gen, event)
+            if event == "removed":
+                self._tombstones += 1
+                self._compact()
+
+    def _compact(self):
+        while self._tombstones > self.max_tombstones:
+            for key, (gen, event) in self._changes.items():
+                if event == "removed":
+                    del self._changes[key]
+                    self._tombstones -= 1
+                    self.floor = max(self.floor, gen)
+                    break
+
+    def rebase(self, generation):
+        """把同步下限提高到 generation，并丢弃不会再被返回的旧变更（如启动时读取文件产生的 created）
+
+        更早的 since 都需要全量同步：此前删除的文件在本进程中没有墓碑
+        """
+        with self._lock:
+            self.floor = max(self.floor, generation)
+            for key in [k for k, (gen, _) in self._changes.items() if gen <= self.floor]:
+                if self._changes.pop(key)[1] == "removed":
+                    self._tombstones -= 1
+
+    def since(self, generation):
+        """返回版本号大于 generation 的变更 [(type, filename, 版本号, 事件)]，按版本号升序"""
+        result = []
+        with self._lock:
+            for (doc_type, filename), (gen, event) in reversed(self._changes.items()):
+                if gen <= generation:
+                    break
+                result.append((doc_type, filename, gen, event))
+        result.reverse()
+        return result
+
+change_log = ChangeLog(max_tombstones=SYNC_CONFIG.get("max_tombstones", 1000))
+for _catalog in CATALOGS.values():
+    _catalog.add_listener(change_log.on_change)
+
+def conditional_get(f):
+    """为只读接口添加 ETag / Last-Modified，并在客户端缓存仍有效时直接返回 304（不读取、不渲染任何内容）"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        refresh_catalogs()
+        gen, modified = content_generation.snapshot()
+        # 同一版本下，不同的查询参数、客户端类型和可见范围对应不同的表示
+        variant = f"{request.full_path}|{is_mobile_client()}"
+        cutoff = view_cutoff()
+        if cutoff is not None:
+            variant += "|" + ",".join(str(c.count_visible(cutoff)) for c in CATALOGS.values())
+            # 条目超出可见天数时可见内容也会变化：最近一个过期条目的过期时刻同样计入 Last-Modified
+            for c in CATALOGS.values():
+                ts = c.last_expired(cutoff)
+                if ts is not None:
+                    modified = max(modified, min(ts + VIEW_LIMIT * 86400, time.time()))
+        etag = f"{BOOT_ID}-{gen}-{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]}"
+        last_modified = datetime.fromtimestamp(int(modified), tz=timezone.utc)
+
+        not_modified = False
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since is not None:
+            not_modified = last_modified.timestamp() <= request.if_modified_since.timestamp()
+
+        if not_modified:
+            resp = make_response("", 304)
+        else:
+            resp = make_response(f(*args, **kwargs))
+            if resp.status_code != 200 or resp.cache_control.no_store:
+                # 出错或不可缓存的响应（如超时截断的正则搜索）不带 ETag / Last-Modified
+                return resp
+        # 预压缩的响应（见 FeedSnapshots）与原始表示不同，使用弱 ETag
+        resp.set_etag(etag, weak="Content-Encoding" in resp.headers)
+        resp.last_modified = last_modified
+        return resp
+    return decorated
+
 @app.route("/")
 def index():
     """这是主页面"""
@@ -183,64 +1691,235 @@ def _req_log():
 def _res_log(resp):
     dur = (time.time() - getattr(g, '_ts', time.time())) * 1000.0
     try:
-        length = resp.calculate_content_length()
+        # 流式响应（如 /api/events）不能提前读取内容计算长度
+        length = '-' if resp.is_streamed else resp.calculate_content_length()
     except Exception:
         length = '-'
     logger.info("RES %s %s status=%s dur=%.1fms len=%s", request.method, request.path, resp.status_code, dur, length)
     return resp
 
+# 压缩结果缓存：(编码, 路径, ETag 或内容 sha1) -> 压缩后的字节
+compressed_cache = LRUCache(max_bytes=int(COMPRESS_CONFIG.get("cache_mb", 32) * 1024 * 1024))
+COMPRESS_PREFIXES = ("/api/", "/css/", "/script/")
+
+def choose_encoding():
+    """根据 Accept-Encoding 选择压缩方式，优先 brotli"""
+    accept = request.accept_encodings
+    if brotli is not None and accept.quality("br") > 0:
+        return "br"
+    if accept.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+def compress_body(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_CONFIG.get("brotli_quality", 5))
+    return gzip.compress(data, compresslevel=COMPRESS_CONFIG.get("level", 6), mtime=0)
+
+@app.after_request
+def _compress(resp):
+    """压缩 /api/* 与 css、script 静态资源，同一版本的压缩结果会被缓存复用"""
+    if not COMPRESS_CONFIG.get("enabled", True):
+        return resp
+    if request.method != "GET" or not request.path.startswith(COMPRESS_PREFIXES):
+        return resp
+    if resp.status_code != 200 or resp.mimetype == "text/event-stream" or "Content-Encoding" in resp.headers:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = choose_encoding()
+    if encoding is None:
+        return resp
+
+    resp.direct_passthrough = False
+    data = resp.get_data()
+    if len(data) < COMPRESS_CONFIG.get("min_size", 1024):
+        return resp
+    # 带 ETag 的响应（只读接口的内容版本、静态文件的修改时间）直接按 ETag 缓存，否则按内容摘要缓存；
+    # no-store 的响应（如超时截断的正则搜索）不进入缓存
+    etag, _ = resp.get_etag()
+    if resp.cache_control.no_store:
+        body = compress_body(data, encoding)
+    else:
+        key = (encoding, request.full_path, etag or hashlib.sha1(data).hexdigest())
+        body = compressed_cache.get(key)
+        if body is None:
+            body = compress_body(data, encoding)
+            compressed_cache.put(key, body)
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    if etag:
+        # 压缩后的表示与原始表示不同，改为弱 ETag
+        resp.set_etag(etag, weak=True)
+    return resp
+
 @app.errorhandler(Exception)
 def _err_log(e):
     logger.exception("ERR %s %s", request.method, request.path)
     return jsonify({"error": "Internal Server Error"}), 500
 
-@app.route("/api/posts")
-def api_posts():
-    """返回所有动态，按时间倒序（最新在前）"""
-    POST_DIR = "posts"
-    if not os.path.exists(POST_DIR):
-        return jsonify({"count": 0, "posts": []})
+def paginated_list(catalog, key, convert_latex, fields=None):
+    """按 limit + cursor 参数返回 keyset 分页结果，只渲染当前页的条目"""
+    limit = request.args.get("limit", type=int) or 20
+    limit = max(1, min(limit, 200))
+    cursor = request.args.get("cursor")
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    cutoff = view_cutoff()
+    page, has_more = catalog.page(after=after, limit=limit, cutoff=cutoff)
+    res = {
+        "count": catalog.count_visible(cutoff),
+        key: [catalog.project(e, fields, convert_latex_to_mathml=convert_latex) for e in page],
+        "next_cursor": encode_cursor(page[-1]) if has_more else None
+    }
+    logger.info("api/%s page size=%s cursor=%s has_more=%s", key, len(page), bool(cursor), has_more)
+    return jsonify(res)
+
+class FeedSnapshots:
+    """预先序列化的完整列表快照：/api/posts 与 /api/status/history 不带参数时的返回，桌面端和移动端各一份
 
-    files = [os.path.join(POST_DIR, f) for f in os.listdir(POST_DIR) if f.endswith(".md")]
+    内容变化后在后台线程中重建（短暂延迟合并连续写入），构建完成后整体替换引用，读取方不会看到构建一半的快照；
+    快照对应的版本号或可见条目数与当前不一致时不使用，回退到正常生成。
+    目录首次完整加载期间的变更不触发重建，第一份快照在首次请求完整列表时构建
+    """
+
+    FEEDS = {"posts": post_catalog, "statuses": status_catalog}
+
+    def __init__(self, delay=0.2, compress=True):
+        self.delay = delay
+        self.compress = compress
+        self._snapshots = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self, *args):
+        """安排一次后台重建"""
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.rebuild)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def on_change(self, event, catalog, filename):
+        """目录变更回调：冷启动逐个加载文件时不重建，避免反复渲染整个列表"""
+        if catalog.loaded:
+            self.schedule()
+
+    def rebuild(self):
+        with self._lock:
+            self._timer = None
+        start = time.time()
+        try:
+            gen = content_generation.snapshot()[0]
+            cutoff = view_cutoff()
+            snapshots = {}
+            for key, catalog in self.FEEDS.items():
+                entries = catalog.visible(cutoff)
+                for mobile in (False, True):
+                    res = {
+                        "count": len(entries),
+                        key: [catalog.render(e, convert_latex_to_mathml=not mobile) for e in entries]
+                    }
+                    body = app.json.response(res).get_data()
+                    snapshots[(key, mobile)] = {
+                        "generation": gen,
+                        "count": len(entries),
+                        "body": body,
+                        "gzip": gzip.compress(body, compresslevel=COMPRESS_CONFIG.get("level", 6), mtime=0)
+                                if self.compress else None
+                    }
+            self._snapshots = snapshots
+            logger.info("feed snapshots rebuilt generation=%s dur=%.1fms", gen, (time.time() - start) * 1000.0)
+        except Exception as e:
+            logger.error("feed snapshots rebuild error: %s", e)
+
+    def get(self, key, mobile, cutoff):
+        """返回仍然有效的快照，失效时安排重建并返回 None"""
+        snap = self._snapshots.get((key, mobile))
+        if (snap is None or snap["generation"] != content_generation.snapshot()[0]
+                or snap["count"] != self.FEEDS[key].count_visible(cutoff)):
+            self.schedule()
+            return None
+        return snap
+
+    def response(self, snap):
+        """直接发送快照字节，客户端支持 gzip 时发送预压缩的版本"""
+        resp = Response(snap["body"], mimetype="application/json")
+        if COMPRESS_CONFIG.get("enabled", True) and snap["gzip"] is not None:
+            resp.vary.add("Accept-Encoding")
+            if request.accept_encodings.quality("gzip") > 0:
+                resp.set_data(snap["gzip"])
+                resp.headers["Content-Encoding"] = "gzip"
+        return resp
+
+feed_snapshots = None
+if SNAPSHOT_CONFIG.get("enabled", True):
+    feed_snapshots = FeedSnapshots(delay=SNAPSHOT_CONFIG.get("delay", 0.2),
+                                   compress=SNAPSHOT_CONFIG.get("compress", True))
+    for _catalog in CATALOGS.values():
+        _catalog.add_listener(feed_snapshots.on_change)
+
+def serve_snapshot(key, is_mobile):
+    """不带参数（client 除外）的完整列表请求优先使用预先生成的快照，没有可用快照时返回 None"""
+    if feed_snapshots is None or set(request.args) - {"client"}:
+        return None
+    snap = feed_snapshots.get(key, is_mobile, view_cutoff())
+    if snap is None:
+        return None
+    logger.info("api/%s snapshot count=%s, mobile=%s", key, snap["count"], is_mobile)
+    return feed_snapshots.response(snap)
 
+@app.route("/api/posts")
+@conditional_get
+def api_posts():
+    """返回所有动态，按时间倒序（最新在前）；提供 limit 或 cursor 参数时分页返回，提供 tag 参数时只返回该标签的动态"""
     # 检测是否为移动端请求
     is_mobile = is_mobile_client()
     convert_latex = not is_mobile  # 移动端不转换 LaTeX
 
-    posts = []
-    for fp in files:
-        post = load_post(fp, convert_latex_to_mathml=convert_latex)
-        # 尝试读取 meta.time，转换为 datetime 对象
-        t_str = post["meta"].get("time", "1970-01-01 00:00:00")
-        try:
-            post_time = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            post_time = datetime(1970, 1, 1)
-        post["meta"]["_datetime"] = post_time  # 临时字段，用于排序
-        posts.append(post)
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # 按时间排序，最新在前
-    posts.sort(key=lambda x: x["meta"]["_datetime"], reverse=True)
+    snapshot = serve_snapshot("posts", is_mobile)
+    if snapshot is not None:
+        return snapshot
 
-    # 删除临时字段
-    for p in posts:
-        p["meta"].pop("_datetime", None)
+    # 按标签筛选时通过标签索引只访问该标签下的动态
+    tag = request.args.get("tag")
+    source = tag_index.view(tag) if tag else post_catalog
+
+    if "limit" in request.args or "cursor" in request.args:
+        return paginated_list(source, "posts", convert_latex, fields)
 
     # 应用天数限制过滤
-    posts = filter_by_time_limit(posts, time_key="meta", time_field="time")
+    cutoff = view_cutoff()
+    posts = [source.project(e, fields, convert_latex_to_mathml=convert_latex)
+             for e in source.visible(cutoff)]
 
     res = {
         "count": len(posts),
         "posts": posts
     }
-    logger.info("api/posts count=%s, mobile=%s", res["count"], is_mobile)
+    logger.info("api/posts count=%s, tag=%s, mobile=%s", res["count"], tag, is_mobile)
     return jsonify(res)
 
+@app.route("/api/tags")
+@conditional_get
+def api_tags():
+    """返回所有标签及其可见动态数量，按数量倒序"""
+    tags = [{"name": tag, "count": count} for tag, count in tag_index.counts(view_cutoff())]
+    logger.info("api/tags count=%s", len(tags))
+    return jsonify({"count": len(tags), "tags": tags})
+
 @app.route("/api/post/<post_id>")
+@conditional_get
 def get_single_post(post_id):
     """获取单条动态详情"""
-    filepath = os.path.join("posts", f"{post_id}.md")
-    if not os.path.isfile(filepath):
+    entry = post_catalog.get(f"{post_id}.md")
+    if entry is None:
         logger.warning("api/post not_found id=%s", post_id)
         return jsonify({"error": "Post not found"}), 404
 
@@ -248,31 +1927,38 @@ def get_single_post(post_id):
     is_mobile = is_mobile_client()
     convert_latex = not is_mobile  # 移动端不转换 LaTeX
     
-    post = load_post(filepath, convert_latex_to_mathml=convert_latex)
     # 检查是否超过天数限制
-    filtered = filter_by_time_limit([post], time_key="meta", time_field="time")
-    if not filtered:
+    if not is_visible(entry, view_cutoff()):
         logger.warning("api/post expired id=%s", post_id)
         return jsonify({"error": "Post not found"}), 404
     
+    post = post_catalog.render(entry, convert_latex_to_mathml=convert_latex)
     return jsonify(post)
 
 @app.route("/api/post/query")
+@conditional_get
 def api_post_query():
-    """查询动态（按日期或文件名）"""
+    """查询动态（按日期、日期区间或文件名）"""
     date = request.args.get("date")
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
     filename = request.args.get("filename")
-    limit = request.args.get("limit", type=int) or 20
-    offset = request.args.get("offset", type=int) or 0
+    limit = max(request.args.get("limit", type=int) or 20, 0)
+    offset = max(request.args.get("offset", type=int) or 0, 0)
 
-    # date 和 filename 至少提供一个
-    if not date and not filename:
-        return jsonify({"error": "At least one of 'date' or 'filename' must be provided"}), 400
+    # date / from / to 和 filename 至少提供一个
+    if not date and not date_from and not date_to and not filename:
+        return jsonify({"error": "At least one of 'date', 'from', 'to' or 'filename' must be provided"}), 400
+
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # 如果提供了 filename，优先按文件名查询（返回单个动态）
     if filename:
-        filepath = os.path.join("posts", filename)
-        if not os.path.isfile(filepath):
+        entry = post_catalog.get(filename)
+        if entry is None:
             logger.warning("api/post/query not_found filename=%s", filename)
             return jsonify({"error": "Post not found"}), 404
         
@@ -280,155 +1966,128 @@ def api_post_query():
         is_mobile = is_mobile_client()
         convert_latex = not is_mobile  # 移动端不转换 LaTeX
         
-        post = load_post(filepath, convert_latex_to_mathml=convert_latex)
         # 检查是否超过天数限制
-        filtered = filter_by_time_limit([post], time_key="meta", time_field="time")
-        if not filtered:
+        if not is_visible(entry, view_cutoff()):
             logger.warning("api/post/query expired filename=%s", filename)
             return jsonify({"error": "Post not found"}), 404
         
+        post = post_catalog.project(entry, fields, convert_latex_to_mathml=convert_latex)
         logger.info("api/post/query filename=%s, mobile=%s", filename, is_mobile)
         return jsonify(post)
     
-    # 按日期查询（返回列表）
-    if date:
-        # 验证日期格式
+    # 按日期或日期区间查询（返回列表），date 等价于 from = to = date
+    start, end = (date, date) if date else (date_from, date_to)
+    # 验证日期格式
+    for d in (start, end):
+        if d is None:
+            continue
         try:
-            datetime.strptime(date, "%Y-%m-%d")
+            datetime.strptime(d, "%Y-%m-%d")
         except ValueError:
             return jsonify({"error": "Invalid date format, expected YYYY-MM-DD"}), 400
-        
-        # 查找该日期的所有动态文件
-        POST_DIR = "posts"
-        if not os.path.exists(POST_DIR):
-            return jsonify({"count": 0, "posts": []})
-        
-        files = [os.path.join(POST_DIR, f) for f in os.listdir(POST_DIR) 
-                 if f.endswith(".md") and f.startswith(date)]
-        
-        # 检测是否为移动端请求
-        is_mobile = is_mobile_client()
-        convert_latex = not is_mobile  # 移动端不转换 LaTeX
-        
-        # 加载所有动态
-        posts = []
-        for fp in files:
-            try:
-                post = load_post(fp, convert_latex_to_mathml=convert_latex)
-                # 验证时间是否匹配（以防文件名格式不一致）
-                t_str = post["meta"].get("time", "")
-                if t_str.startswith(date):
-                    posts.append(post)
-            except Exception as e:
-                logger.warning("api/post/query error loading file=%s error=%s", fp, e)
-                continue
-        
-        # 按时间排序（最新在前）
-        posts.sort(key=lambda x: x["meta"].get("time", ""), reverse=True)
-        
-        # 应用天数限制过滤
-        posts = filter_by_time_limit(posts, time_key="meta", time_field="time")
-        
-        # 分页
-        total_count = len(posts)
-        paginated_posts = posts[offset:offset + limit]
-        
-        res = {
-            "count": total_count,
-            "posts": paginated_posts
-        }
-        logger.info("api/post/query date=%s count=%s offset=%s limit=%s", date, total_count, offset, limit)
-        return jsonify(res)
     
-    return jsonify({"error": "Invalid parameters"}), 400
-
-def load_status(filepath, convert_latex_to_mathml=True):
-    """读取单条状态文件
+    # 检测是否为移动端请求
+    is_mobile = is_mobile_client()
+    convert_latex = not is_mobile  # 移动端不转换 LaTeX
     
-    Args:
-        filepath: 文件路径
-        convert_latex_to_mathml: 是否将 LaTeX 转换为 MathML（移动端设为 False）
-    """
-    with open(filepath, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    if text.startswith("---"):
-        try:
-            _, fm, body = text.split("---", 2)
-            meta = yaml.safe_load(fm) or {}
-        except:
-            meta = {}
-            body = text
-    else:
-        meta = {}
-        body = text
-
-    html = markdown(body, extensions=["extra", "codehilite"])
-    # 处理 LaTeX 公式
-    html = render_latex_in_html(html, convert_to_mathml=convert_latex_to_mathml)
-    return {
-        "filename": os.path.basename(filepath),
-        "meta": meta,
-        "raw": text,
-        "html": html
-    }
-
-def list_statuses(convert_latex_to_mathml=True):
-    """列出所有状态，按时间倒序
+    # 通过日期索引只取出当前页（按时间倒序），并应用天数限制过滤
+    total_count, page = post_catalog.day_range(start, end, offset=offset, limit=limit, cutoff=view_cutoff())
+    paginated_posts = [post_catalog.project(e, fields, convert_latex_to_mathml=convert_latex) for e in page]
     
-    Args:
-        convert_latex_to_mathml: 是否将 LaTeX 转换为 MathML（移动端设为 False）
-    """
-    if not os.path.exists("status"):
-        return []
-
-    files = [os.path.join("status", f) for f in os.listdir("status") if f.endswith(".md")]
-
-    statuses = []
-    for fp in files:
-        s = load_status(fp, convert_latex_to_mathml=convert_latex_to_mathml)
-        # 尝试解析时间
-        t_str = s["meta"].get("time", "1970-01-01 00:00:00")
-        try:
-            s["_datetime"] = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            s["_datetime"] = datetime(1970,1,1)
-        statuses.append(s)
+    res = {
+        "count": total_count,
+        "posts": paginated_posts
+    }
+    logger.info("api/post/query from=%s to=%s count=%s offset=%s limit=%s", start, end, total_count, offset, limit)
+    return jsonify(res)
 
-    statuses.sort(key=lambda x: x["_datetime"], reverse=True)
+class LatestStatus:
+    """最新可见状态的指针，以及它在两种 LaTeX 模式下预先序列化好的返回内容
 
-    # 删除临时字段
-    for s in statuses:
-        s.pop("_datetime", None)
+    状态发生任何变更（发布、编辑、删除或磁盘变化）时失效，下次请求时重新定位；
+    指向的状态超出可见天数或 view_time_limit_days 被修改时同样重新定位
+    """
 
-    return statuses
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._state = None
+        self._version = 0
+        self._lock = threading.Lock()
+        catalog.add_listener(self.invalidate)
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._version += 1
+            self._state = None
+
+    def _valid(self, state, cutoff):
+        if state is None or state["view_limit"] != VIEW_LIMIT:
+            return False
+        entry = state["entry"]
+        # 可见时间下限只会随时间后移，指向的状态过期前不会有其他状态重新变为可见
+        return entry is None or cutoff is None or not entry["time_ok"] or entry["ts"] >= cutoff
+
+    def get(self):
+        """返回 {"entry", 是否移动端 -> 序列化后的字节}，没有可见状态时 entry 为 None"""
+        cutoff = view_cutoff()
+        state = self._state
+        if self._valid(state, cutoff):
+            return state
+        with self._lock:
+            version = self._version
+        entry = self.catalog.latest(cutoff)
+        state = {"entry": entry, "view_limit": VIEW_LIMIT}
+        if entry is not None:
+            for mobile in (False, True):
+                state[mobile] = app.json.response(
+                    self.catalog.render(entry, convert_latex_to_mathml=not mobile)).get_data()
+        with self._lock:
+            # 计算期间状态又有变更时不保存，下次请求重新计算
+            if version == self._version:
+                self._state = state
+        return state
+
+latest_status = LatestStatus(status_catalog)
 
 @app.route("/api/status/current")
+@conditional_get
 def api_status_current():
     """获取最新状态"""
     # 检测是否为移动端请求
     is_mobile = is_mobile_client()
-    convert_latex = not is_mobile  # 移动端不转换 LaTeX
     
-    statuses = list_statuses(convert_latex_to_mathml=convert_latex)
-    # 应用天数限制过滤
-    statuses = filter_by_time_limit(statuses, time_key="meta", time_field="time")
-    if not statuses:
+    # 应用天数限制过滤，直接返回预先生成的最新状态
+    state = latest_status.get()
+    if state["entry"] is None:
         logger.warning("api/status/current empty")
         return jsonify({"error": "No status found"}), 404
-    logger.info("api/status/current filename=%s, mobile=%s", statuses[0].get('filename'), is_mobile)
-    return jsonify(statuses[0])
+    logger.info("api/status/current filename=%s, mobile=%s", state["entry"]["filename"], is_mobile)
+    return Response(state[is_mobile], mimetype="application/json")
 
 @app.route("/api/status/history")
+@conditional_get
 def api_status_history():
-    """获取历史状态列表"""
+    """获取历史状态列表；提供 limit 或 cursor 参数时分页返回"""
     # 检测是否为移动端请求
     is_mobile = is_mobile_client()
     convert_latex = not is_mobile  # 移动端不转换 LaTeX
+
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if "limit" in request.args or "cursor" in request.args:
+        return paginated_list(status_catalog, "statuses", convert_latex, fields)
+
+    snapshot = serve_snapshot("statuses", is_mobile)
+    if snapshot is not None:
+        return snapshot
     
-    statuses = list_statuses(convert_latex_to_mathml=convert_latex)
     # 应用天数限制过滤
-    statuses = filter_by_time_limit(statuses, time_key="meta", time_field="time")
+    cutoff = view_cutoff()
+    statuses = [status_catalog.project(e, fields, convert_latex_to_mathml=convert_latex)
+                for e in status_catalog.visible(cutoff)]
     res = {
         "count": len(statuses),
         "statuses": statuses
@@ -437,21 +2096,29 @@ def api_status_history():
     return jsonify(res)
 
 @app.route("/api/status/query")
+@conditional_get
 def api_status_query():
-    """查询状态（按日期或文件名）"""
+    """查询状态（按日期、日期区间或文件名）"""
     date = request.args.get("date")
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
     filename = request.args.get("filename")
-    limit = request.args.get("limit", type=int) or 20
-    offset = request.args.get("offset", type=int) or 0
+    limit = max(request.args.get("limit", type=int) or 20, 0)
+    offset = max(request.args.get("offset", type=int) or 0, 0)
 
-    # date 和 filename 至少提供一个
-    if not date and not filename:
-        return jsonify({"error": "At least one of 'date' or 'filename' must be provided"}), 400
+    # date / from / to 和 filename 至少提供一个
+    if not date and not date_from and not date_to and not filename:
+        return jsonify({"error": "At least one of 'date', 'from', 'to' or 'filename' must be provided"}), 400
+
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # 如果提供了 filename，优先按文件名查询（返回单个状态）
     if filename:
-        filepath = os.path.join("status", filename)
-        if not os.path.isfile(filepath):
+        entry = status_catalog.get(filename)
+        if entry is None:
             logger.warning("api/status/query not_found filename=%s", filename)
             return jsonify({"error": "Status not found"}), 404
         
@@ -459,78 +2126,139 @@ def api_status_query():
         is_mobile = is_mobile_client()
         convert_latex = not is_mobile  # 移动端不转换 LaTeX
         
-        status = load_status(filepath, convert_latex_to_mathml=convert_latex)
         # 检查是否超过天数限制
-        filtered = filter_by_time_limit([status], time_key="meta", time_field="time")
-        if not filtered:
+        if not is_visible(entry, view_cutoff()):
             logger.warning("api/status/query expired filename=%s", filename)
             return jsonify({"error": "Status not found"}), 404
         
+        status = status_catalog.project(entry, fields, convert_latex_to_mathml=convert_latex)
         logger.info("api/status/query filename=%s, mobile=%s", filename, is_mobile)
         return jsonify(status)
     
-    # 按日期查询（返回列表）
-    if date:
-        # 验证日期格式
+    # 按日期或日期区间查询（返回列表），date 等价于 from = to = date
+    start, end = (date, date) if date else (date_from, date_to)
+    # 验证日期格式
+    for d in (start, end):
+        if d is None:
+            continue
         try:
-            datetime.strptime(date, "%Y-%m-%d")
+            datetime.strptime(d, "%Y-%m-%d")
         except ValueError:
             return jsonify({"error": "Invalid date format, expected YYYY-MM-DD"}), 400
-        
-        # 查找该日期的所有状态文件
-        STATUS_DIR = "status"
-        if not os.path.exists(STATUS_DIR):
-            return jsonify({"count": 0, "statuses": []})
-        
-        files = [os.path.join(STATUS_DIR, f) for f in os.listdir(STATUS_DIR) 
-                 if f.endswith(".md") and f.startswith(date)]
-        
-        # 检测是否为移动端请求
-        is_mobile = is_mobile_client()
-        convert_latex = not is_mobile  # 移动端不转换 LaTeX
-        
-        # 加载所有状态
-        statuses = []
-        for fp in files:
-            try:
-                status = load_status(fp, convert_latex_to_mathml=convert_latex)
-                # 验证时间是否匹配（以防文件名格式不一致）
-                t_str = status["meta"].get("time", "")
-                if t_str.startswith(date):
-                    statuses.append(status)
-            except Exception as e:
-                logger.warning("api/status/query error loading file=%s error=%s", fp, e)
-                continue
-        
-        # 按时间排序（最新在前）
-        statuses.sort(key=lambda x: x["meta"].get("time", ""), reverse=True)
-        
-        # 应用天数限制过滤
-        statuses = filter_by_time_limit(statuses, time_key="meta", time_field="time")
-        
-        # 分页
-        total_count = len(statuses)
-        paginated_statuses = statuses[offset:offset + limit]
-        
-        res = {
-            "count": total_count,
-            "statuses": paginated_statuses
-        }
-        logger.info("api/status/query date=%s count=%s offset=%s limit=%s", date, total_count, offset, limit)
-        return jsonify(res)
     
-    return jsonify({"error": "Invalid parameters"}), 400
+    # 检测是否为移动端请求
+    is_mobile = is_mobile_client()
+    convert_latex = not is_mobile  # 移动端不转换 LaTeX
+    
+    # 通过日期索引只取出当前页（按时间倒序），并应用天数限制过滤
+    total_count, page = status_catalog.day_range(start, end, offset=offset, limit=limit, cutoff=view_cutoff())
+    paginated_statuses = [status_catalog.project(e, fields, convert_latex_to_mathml=convert_latex) for e in page]
+    
+    res = {
+        "count": total_count,
+        "statuses": paginated_statuses
+    }
+    logger.info("api/status/query from=%s to=%s count=%s offset=%s limit=%s", start, end, total_count, offset, limit)
+    return jsonify(res)
+
+# 归档统计的粒度 -> (允许的日期参数格式, 分组键长度)
+ARCHIVE_GRANULARITY = {
+    "day": (("%Y-%m-%d",), 10),
+    "month": (("%Y-%m-%d", "%Y-%m"), 7),
+}
+
+def parse_date_arg(value, formats):
+    """日期参数是否符合 formats 中的任一格式"""
+    for fmt in formats:
+        try:
+            datetime.strptime(value, fmt)
+            return True
+        except ValueError:
+            pass
+    return False
+
+@app.route("/api/archive")
+@conditional_get
+def api_archive():
+    """按天或按月统计日期区间内的动态和状态数量（日历视图用）"""
+    granularity = request.args.get("granularity", "day")
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+
+    if granularity not in ARCHIVE_GRANULARITY:
+        return jsonify({"error": "Invalid granularity, expected 'day' or 'month'"}), 400
+    formats, width = ARCHIVE_GRANULARITY[granularity]
+    for d in (date_from, date_to):
+        if d is not None and not parse_date_arg(d, formats):
+            expected = " or ".join(f.replace("%Y", "YYYY").replace("%m", "MM").replace("%d", "DD") for f in formats)
+            return jsonify({"error": f"Invalid date format, expected {expected}"}), 400
+    # 按月统计时 from / to 也可以写成 YYYY-MM，分别展开为当月第一天和最后一天
+    start, end = date_from, date_to
+    if start and len(start) == 7:
+        start += "-01"
+    if end and len(end) == 7:
+        end += "-31"
+
+    cutoff = view_cutoff()
+    buckets = {}
+    totals = {}
+    for key, catalog in (("post", post_catalog), ("status", status_catalog)):
+        total = 0
+        for day, n in catalog.day_counts(start, end, cutoff):
+            bucket = buckets.setdefault(day[:width], {"date": day[:width], "post_count": 0, "status_count": 0})
+            bucket[f"{key}_count"] += n
+            total += n
+        totals[f"{key}_count"] = total
+    if granularity == "day":
+        # 日历在有状态的日期上显示当天状态的图标
+        for bucket in buckets.values():
+            bucket["status_icon"] = (status_catalog.day_first_meta(bucket["date"], "icon", cutoff)
+                                     if bucket["status_count"] else None)
+
+    res = {
+        "granularity": granularity,
+        "from": date_from,
+        "to": date_to,
+        "post_count": totals["post_count"],
+        "status_count": totals["status_count"],
+        "buckets": [buckets[k] for k in sorted(buckets)]
+    }
+    logger.info("api/archive granularity=%s from=%s to=%s buckets=%s", granularity, date_from, date_to, len(buckets))
+    return jsonify(res)
 
 def strip_html(html_text):
     """把 HTML 内容去掉标签，只保留纯文本。"""
     return re.sub(r"<[^>]+>", "", html_text or "")
 
-def segment_terms(s):
-    """jieba 分词"""
+_jieba = None
+_jieba_state = None  # None: 未加载, "ready": 词典已就绪, "missing": 未安装
+_jieba_lock = threading.Lock()
+
+def get_jieba():
+    """按需导入 jieba 并构建词典（耗时数秒），未安装时返回 None"""
+    global _jieba, _jieba_state
+    if _jieba_state is None:
+        with _jieba_lock:
+            if _jieba_state is None:
+                try:
+                    import jieba
+                    start = time.time()
+                    jieba.initialize()
+                    _jieba = jieba
+                    _jieba_state = "ready"
+                    logger.info("jieba ready dur=%.1fms", (time.time() - start) * 1000.0)
+                except ImportError:
+                    _jieba_state = "missing"
+                    logger.warning("jieba not installed, falling back to simple tokenization")
+    return _jieba
+
+def tokenize(s):
+    """jieba 分词，返回全部小写词元（保留重复）"""
     s = (s or "").strip()
     if not s:
         return []
     toks = []
+    jieba = get_jieba()
     if jieba:
         try:
             toks = list(jieba.cut_for_search(s))
@@ -540,120 +2268,580 @@ def segment_terms(s):
         ascii_runs = re.findall(r"[A-Za-z0-9_]+", s)
         zh_runs = re.findall(r"[\u4e00-\u9fff]+", s)
         toks = ascii_runs + zh_runs
+    return [t.lower() for t in toks if t]
+
+def segment_terms(s):
+    """jieba 分词（去重，保持顺序）"""
     seen = set(); ordered = []
-    for t in toks:
-        tl = t.lower()
-        if tl and tl not in seen:
+    for tl in tokenize(s):
+        if tl not in seen:
             seen.add(tl)
             ordered.append(tl)
     return ordered
 
-def score_item(q, item_text, name="", tags=None):
-    """给一条动态或状态打分，表示它和搜索词 q 的匹配程度。"""
-    tags = tags or []
-    s = (q or "").strip()
-    if not s:
-        return 0
-    hay = f"{name} {' '.join(tags)} {item_text}".lower()
-    sc = 0
-    is_regex = re.match(r"^\s*/.+/[a-zA-Z0-9]*\s*$", s)
-    if is_regex:
-        try:
-            m = re.match(r"^\s*/(.+)/([a-zA-Z0-9]*)\s*$", s)
-            pattern = m.group(1)
+REGEX_QUERY_RE = re.compile(r"^\s*/(.+)/([a-zA-Z0-9]*)\s*$")
+ASCII_RE = re.compile(r"^[\x00-\x7F]+$")
+# 词元中至少包含一个字母、数字或汉字才进入索引
+WORD_RE = re.compile(r"\w")
+
+class CompiledQuery:
+    """编译后的搜索条件：正则、分词结果、小写形式和匹配阈值每个请求只计算一次，再对所有文档复用"""
+
+    def __init__(self, q):
+        self.text = (q or "").strip()
+        self.regex = None
+        self.lower = self.text.lower()
+        self.small_ascii = False
+        self.tokens = []
+        m = REGEX_QUERY_RE.match(self.text)
+        self.is_regex = bool(m)
+        if self.is_regex:
             flags = 0
-            if m.group(2):
-                if 'i' in m.group(2): flags |= re.IGNORECASE
-            reg = re.compile(pattern, flags)
-            if reg.search(hay): sc += 90
-        except Exception:
-            pass
-    else:
-        ql = s.lower()
-        small_ascii = len(ql) < 2 and re.match(r"^[\x00-\x7F]+$", ql)
-        if any(t.lower() == ql for t in tags): sc += 120
-        if name.lower().startswith(ql): sc += 90
-        if not small_ascii:
-            if ql in name.lower(): sc += 70
+            if 'i' in m.group(2): flags |= re.IGNORECASE
+            try:
+                self.regex = re.compile(m.group(1), flags)
+            except Exception:
+                self.regex = None
+            self.threshold = 60
+        else:
+            self.small_ascii = len(self.text) < 2 and bool(ASCII_RE.match(self.text))
+            self.tokens = segment_terms(self.lower)
+            self.threshold = 80 if self.small_ascii else 40
+        # 每个词元的基础分
+        self._token_bases = [(t, 8 * max(1, len(t))) for t in self.tokens]
+
+    @property
+    def index_tokens(self):
+        """可用于倒排索引查找的词元（去掉空白和标点）"""
+        return [t for t in self.tokens if WORD_RE.search(t)]
+
+    def score(self, item_text, name="", tags=None):
+        """给一条动态或状态打分，表示它和搜索词的匹配程度。"""
+        if not self.text:
+            return 0
+        tags = tags or []
+        hay = f"{name} {' '.join(tags)} {item_text}".lower()
+        if self.is_regex:
+            return 90 if self.regex is not None and self.regex.search(hay) else 0
+        sc = 0
+        ql = self.lower
+        name_l = name.lower()
+        tags_l = [t.lower() for t in tags]
+        if ql in tags_l: sc += 120
+        if name_l.startswith(ql): sc += 90
+        if not self.small_ascii:
+            if ql in name_l: sc += 70
             if ql in hay: sc += 110
-        toks = segment_terms(ql)
-        for t in toks:
-            L = max(1, len(t))
-            base = 8 * L
-            if any(tt.lower() == t for tt in tags): sc += base + 40
-            if name.lower().startswith(t): sc += base + 30
-            if t in name.lower(): sc += base + 20
+        for t, base in self._token_bases:
+            if t in tags_l: sc += base + 40
+            if name_l.startswith(t): sc += base + 30
+            if t in name_l: sc += base + 20
             if t in hay: sc += base + 16
-    return sc
+        return sc
+
+def score_item(q, item_text, name="", tags=None):
+    """给一条动态或状态打分，表示它和搜索词 q 的匹配程度。
+
+    每次调用都会重新编译查询，批量打分时请使用 CompiledQuery
+    """
+    return CompiledQuery(q).score(item_text, name=name, tags=tags)
+
+def search_fields(entry, doc_type):
+    """返回参与搜索的 (name, tags)：动态使用标签，状态使用状态名"""
+    meta = entry["meta"]
+    if doc_type == "post":
+        tags = meta.get("tags") or []
+        if not isinstance(tags, list):
+            tags = [tags]
+        return "", [str(t) for t in tags]
+    return str(meta.get("name") or ""), []
+
+def text_grams(text):
+    """文本中出现的所有单字和相邻两字（去重）"""
+    return sorted(set(text) | {text[i:i + 2] for i in range(len(text) - 1)})
+
+class SearchIndex:
+    """搜索倒排索引：词元 -> 文档 id 集合，另有单字 / 两字 -> 文档 id 集合用于默认搜索取候选
+
+    文档 id 形如 "post:<filename>" / "status:<filename>"，索引内容为正文纯文本、标签和状态名的分词结果。
+    内容目录变更时只记录待更新的文档，在下次搜索前增量处理；
+    索引会持久化到磁盘，重启后只有内容发生变化的文档需要重新分词
+    """
 
+    VERSION = 3
+
+    def __init__(self, path, sources, save_delay=5.0):
+        self.path = path
+        self.sources = sources  # {"post": post_catalog, "status": status_catalog}
+        self.save_delay = save_delay
+        # doc_id -> {"sig": 正文 sha1 与搜索字段的 sha1, "terms": {词元: 词频}, "length": 词元总数,
+        #            "grams": 小写文本中的单字和两字, "spaced": 状态名或标签是否含空白}
+        self.docs = {}
+        self.postings = {}  # 词元 -> set(doc_id)
+        self.grams = {}  # 单字 / 两字 -> set(doc_id)
+        self.spaced = set()  # 状态名或标签含空白的文档
+        self.total_length = 0  # 所有文档词元总数，用于计算 BM25 平均文档长度
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._pruned = False
+        self._lock = threading.RLock()
+        self._save_timer = None
+        self._dirty = False
+        self._load()
+        for catalog in sources.values():
+            catalog.add_listener(self.on_change)
+
+    def _doc_type(self, catalog):
+        for doc_type, c in self.sources.items():
+            if c is catalog:
+                return doc_type
+        return None
+
+    def on_change(self, event, catalog, filename):
+        """目录变更回调：只记录待更新的文档"""
+        with self._pending_lock:
+            self._pending.add(f"{self._doc_type(catalog)}:{filename}")
+
+    def _load(self):
+        if WORKER_PROCESS or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                logger.info("search index version mismatch, rebuilding path=%s", self.path)
+                return
+            for doc_id, doc in data.get("docs", {}).items():
+                self._add(doc_id, doc)
+            logger.info("search index loaded path=%s docs=%s terms=%s", self.path, len(self.docs), len(self.postings))
+        except Exception as e:
+            logger.warning("search index load error path=%s error=%s", self.path, e)
+            self.docs = {}
+            self.postings = {}
+            self.grams = {}
+            self.spaced = set()
+            self.total_length = 0
+
+    def save(self):
+        """把索引原子地写入磁盘，没有变化时跳过"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = {"version": self.VERSION, "docs": self.docs}
+            try:
+                folder = os.path.dirname(self.path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                # 生产模式下多个工作进程可能同时写入，临时文件按进程区分
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+                logger.info("search index saved path=%s docs=%s", self.path, len(self.docs))
+            except Exception as e:
+                logger.warning("search index save error path=%s error=%s", self.path, e)
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _add(self, doc_id, doc):
+        self.docs[doc_id] = doc
+        self.total_length += doc["length"]
+        for term in doc["terms"]:
+            self.postings.setdefault(term, set()).add(doc_id)
+        for gram in doc["grams"]:
+            self.grams.setdefault(gram, set()).add(doc_id)
+        if doc["spaced"]:
+            self.spaced.add(doc_id)
+
+    def _remove(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self.total_length -= doc["length"]
+        for term in doc["terms"]:
+            ids = self.postings.get(term)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[term]
+        for gram in doc["grams"]:
+            ids = self.grams.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.grams[gram]
+        self.spaced.discard(doc_id)
+        return True
+
+    def sync(self):
+        """处理待更新的文档，使索引与内容目录一致"""
+        for catalog in self.sources.values():
+            catalog.refresh()
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        with self._lock:
+            if not self._pruned:
+                # 首次同步时清理服务停止期间被删除的文档
+                for doc_id in self.docs:
+                    doc_type, filename = doc_id.split(":", 1)
+                    if doc_type not in self.sources or self.sources[doc_type].peek(filename) is None:
+                        pending.add(doc_id)
+                self._pruned = True
+            changed = 0
+            for doc_id in pending:
+                doc_type, filename = doc_id.split(":", 1)
+                catalog = self.sources.get(doc_type)
+                entry = catalog.peek(filename) if catalog else None
+                if entry is None:
+                    changed += self._remove(doc_id)
+                    continue
+                # 签名只依赖正文 sha1 和参与搜索的字段，不需要读取原文（旁路文件还原的条目不含原文）
+                name, tags = search_fields(entry, doc_type)
+                sig = body_digest(json.dumps([entry["digest"], name, tags], ensure_ascii=False))
+                old = self.docs.get(doc_id)
+                if old is not None and old["sig"] == sig:
+                    continue
+                text = f"{name} {' '.join(tags)} {catalog.plain(entry)}"
+                terms = Counter(t for t in tokenize(text) if WORD_RE.search(t))
+                spaced = any(ch.isspace() for ch in name + "".join(tags))
+                self._remove(doc_id)
+                self._add(doc_id, {"sig": sig, "terms": dict(terms), "length": sum(terms.values()),
+                                   "grams": text_grams(text.lower()), "spaced": spaced})
+                changed += 1
+            if changed:
+                logger.info("search index sync changed=%s docs=%s", changed, len(self.docs))
+                self._schedule_save()
+
+    @property
+    def synced(self):
+        """是否已完成过一次与内容目录的同步"""
+        return self._pruned
+
+    def _containing(self, s):
+        """可能包含子串 s 的文档 id：s 的所有两字（单字查询用单字）都出现过的文档"""
+        if len(s) == 1:
+            return set(self.grams.get(s, ()))
+        sets = [self.grams.get(s[i:i + 2]) for i in range(len(s) - 1)]
+        if not all(sets):
+            return set()
+        sets.sort(key=len)
+        return set(sets[0]).intersection(*sets[1:])
+
+    def candidates(self, cq):
+        """返回默认搜索中得分可能达到阈值的文档 id（CompiledQuery.score 命中文档的超集）
+
+        打分的每一项都要求查询串或某个词元出现在小写的 "状态名 标签 正文" 中，因此按单字 / 两字倒排取
+        包含它们的文档，不受分词边界影响（如 "乐放" 命中 "听音乐放松"），标点也能命中。
+        只含空白的词元（如 "开发 优化" 中的空格）几乎出现在所有文档中：只靠它们在正文中的分数达不到阈值时，
+        只有状态名或标签含空白的文档可能额外得分，否则需要检查全部文档
+        """
+        if not cq.lower:
+            return set()
+        blank = [t for t in cq.tokens if not t.strip()]
+        with self._lock:
+            result = set()
+            for s in {cq.lower, *(t for t in cq.tokens if t.strip())}:
+                result |= self._containing(s)
+            if blank:
+                if sum(8 * len(t) + 16 for t in blank) >= cq.threshold:
+                    return set(self.docs)
+                result |= self.spaced
+        return result
+
+    def bm25(self, tokens, k1=1.2, b=0.75):
+        """按 BM25 为包含查询词元的文档打分，返回 {doc_id: score}
+
+        查询词元不在词表中时，用包含它的索引词代替（权重减半），保证英文前缀和中文单字也能命中
+        """
+        scores = {}
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return scores
+            avgdl = self.total_length / n or 1.0
+            for t in tokens:
+                if t in self.postings:
+                    expanded = [(t, 1.0)]
+                else:
+                    expanded = [(term, 0.5) for term in self.postings if t in term]
+                for term, weight in expanded:
+                    ids = self.postings[term]
+                    idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+                    for doc_id in ids:
+                        doc = self.docs[doc_id]
+                        tf = doc["terms"][term]
+                        norm = tf + k1 * (1 - b + b * doc["length"] / avgdl)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * tf * (k1 + 1) / norm
+        return scores
+
+    def idf(self, term):
+        """返回词元的 idf，不在词表中时按只出现在一篇文档计算"""
+        with self._lock:
+            n = len(self.docs)
+            df = len(self.postings.get(term, ())) or 1
+            return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+def make_snippet(text, tokens, width=60):
+    """截取首个命中词附近的纯文本片段，HTML 转义后用 <mark> 高亮命中词"""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    lower = text.lower()
+    hits = [lower.find(t) for t in tokens if t and lower.find(t) >= 0]
+    start = max(0, min(hits) - width // 2) if hits else 0
+    end = min(len(text), start + width * 2)
+    piece = text[start:end]
+    escaped = html_lib.escape(piece)
+    terms = sorted({html_lib.escape(t) for t in tokens if t}, key=len, reverse=True)
+    if terms:
+        pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+        escaped = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", escaped)
+    return ("…" if start > 0 else "") + escaped + ("…" if end < len(text) else "")
+
+def regex_complexity_error(pattern):
+    """检查用户正则的复杂度，超过配置限制时返回错误信息，否则返回 None
+
+    拒绝过长的正则、节点过多的正则，以及 (a+)+ 这类嵌套量词（灾难性回溯的常见来源）
+    """
+    max_length = SEARCH_CONFIG.get("regex_max_length", 200)
+    max_nodes = SEARCH_CONFIG.get("regex_max_nodes", 100)
+    if len(pattern) > max_length:
+        return f"Regex too long (max {max_length} characters)"
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        # 语法错误交给 re.compile 处理
+        return None
+
+    repeat_ops = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+    stats = {"nodes": 0, "nested": False}
+
+    def walk(node, in_repeat):
+        for op, av in node:
+            stats["nodes"] += 1
+            is_repeat = op in repeat_ops and av[1] > 1
+            if is_repeat and in_repeat:
+                stats["nested"] = True
+            for child in (av if isinstance(av, (tuple, list)) else ()):
+                if isinstance(child, sre_parse.SubPattern):
+                    walk(child, in_repeat or is_repeat)
+                elif isinstance(child, list):
+                    for sub in child:
+                        if isinstance(sub, sre_parse.SubPattern):
+                            walk(sub, in_repeat or is_repeat)
+
+    walk(parsed, False)
+    if stats["nested"]:
+        return "Regex with nested quantifiers is not allowed"
+    if stats["nodes"] > max_nodes:
+        return f"Regex too complex (max {max_nodes} nodes)"
+    return None
+
+class RegexScanner:
+    """在进程池中并行执行正则搜索，并限制每次查询的总耗时
+
+    Python 的正则匹配无法在线程中被打断，所以放在独立进程里执行（任务函数在 regex_scan 模块中）；
+    超时后终止整个进程池并在后台重建，返回已经完成的部分结果。
+    时间预算从取得进程池之前开始计算，文档分成小批，单个耗时过长的文档只影响同一批的少量文档
+    """
+
+    def __init__(self, workers=2, timeout=2.0, chunk_size=4):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.chunk_size = max(1, chunk_size)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.get_context("spawn").Pool(self.workers)
+            return self._pool
+
+    def prepare(self):
+        """在后台线程中创建进程池并等待工作进程启动完成，之后的查询不必承担启动耗时"""
+        def run():
+            try:
+                self._get_pool().map(regex_scan.scan_chunk, [("", 0, [])] * self.workers, chunksize=1)
+            except Exception as e:
+                logger.warning("regex pool prepare error=%s", e)
+        threading.Thread(target=run, name="regex-pool", daemon=True).start()
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.terminate()
+        self.prepare()
+
+    def scan(self, regex, docs):
+        """返回 (命中的文档 id 集合, 是否因超时被截断)
+
+        Args:
+            regex: 已编译的正则
+            docs: [(doc_id, 待匹配文本)]
+        """
+        if not docs:
+            return set(), False
+        deadline = time.monotonic() + self.timeout
+        size = self.chunk_size
+        chunks = [(regex.pattern, regex.flags, docs[i:i + size]) for i in range(0, len(docs), size)]
+        pool = self._get_pool()
+        matched = set()
+        results = pool.imap_unordered(regex_scan.scan_chunk, chunks)
+        for done in range(len(chunks)):
+            try:
+                matched.update(results.next(timeout=max(0.0, deadline - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                logger.warning("regex search timeout pattern=%s docs=%s chunks=%s/%s",
+                               regex.pattern[:80], len(docs), done, len(chunks))
+                self._reset_pool(pool)
+                return matched, True
+        return matched, False
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+regex_scanner = RegexScanner(workers=SEARCH_CONFIG.get("regex_workers", 2),
+                             timeout=SEARCH_CONFIG.get("regex_timeout", 2.0),
+                             chunk_size=SEARCH_CONFIG.get("regex_chunk_size", 4))
+if not WORKER_PROCESS:
+    atexit.register(regex_scanner.close)
+
+def bm25_search(cq, limit, offset):
+    """BM25 排序搜索：保留标签与状态名加权，用堆选出前 offset+limit 条，只返回摘要片段"""
+    tokens = cq.index_tokens
+    ql = cq.lower
+    scores = search_index.bm25(tokens, k1=SEARCH_CONFIG.get("bm25_k1", 1.2), b=SEARCH_CONFIG.get("bm25_b", 0.75))
+    cutoff = view_cutoff()
+    scored = []
+    for doc_id, sc in scores.items():
+        doc_type, filename = doc_id.split(":", 1)
+        e = search_index.sources[doc_type].peek(filename)
+        if e is None:
+            continue
+        # 应用天数限制过滤
+        if not is_visible(e, cutoff):
+            continue
+        name, tags = search_fields(e, doc_type)
+        tags_l = [t.lower() for t in tags]
+        name_l = name.lower()
+        if ql in tags_l:
+            sc *= 2.0
+        for t in tokens:
+            if t in tags_l:
+                sc += 2.0 * search_index.idf(t)
+            if name_l.startswith(t):
+                sc += 1.5 * search_index.idf(t)
+            elif t in name_l:
+                sc += 1.0 * search_index.idf(t)
+        scored.append((sc, e["ts"], doc_type, e))
+
+    top = heapq.nlargest(offset + limit, scored, key=lambda x: (x[0], x[1]))[offset:]
+    items = []
+    for sc, _, doc_type, e in top:
+        items.append({
+            'type': doc_type,
+            'filename': e['filename'],
+            'meta': dict(e['meta']),
+            'score': round(sc, 4),
+            'snippet': make_snippet(search_index.sources[doc_type].plain(e), tokens)
+        })
+    return {'count': len(scored), 'offset': offset, 'limit': limit, 'items': items}
+
+search_index = SearchIndex(SEARCH_CONFIG.get("index_path", "cache/search_index.json"),
+                           {"post": post_catalog, "status": status_catalog})
+if not WORKER_PROCESS:
+    atexit.register(search_index.save)
 
 @app.route('/api/search')
+@conditional_get
 def api_search():
     q = request.args.get('q', '')
     # 检测是否为移动端请求
     is_mobile = is_mobile_client()
     convert_latex = not is_mobile  # 移动端不转换 LaTeX
-    
-    items = []
-    if os.path.exists('posts'):
-        for f in os.listdir('posts'):
-            if not f.endswith('.md'):
-                continue
-            fp = os.path.join('posts', f)
-            p = load_post(fp, convert_latex_to_mathml=convert_latex)
-            t_str = p['meta'].get('time', '1970-01-01 00:00:00')
-            try:
-                dt = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-            except:
-                dt = datetime(1970,1,1)
-            plain = strip_html(p.get('html',''))
-            sc = score_item(q, plain, name="", tags=p['meta'].get('tags', []))
-            items.append({
-                'type': 'post',
-                'filename': p['filename'],
-                'meta': p['meta'],
-                'html': p['html'],
-                'raw': p['raw'],
-                '_score': sc,
-                '_dt': dt
-            })
-    for s in list_statuses():
-        t_str = s['meta'].get('time', '1970-01-01 00:00:00')
-        try:
-            dt = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            dt = datetime(1970,1,1)
-        plain = strip_html(s.get('html',''))
-        sc = score_item(q, plain, name=s['meta'].get('name',''), tags=[])
-        items.append({
-            'type': 'status',
-            'filename': s['filename'],
-            'meta': s['meta'],
-            'html': s['html'],
-            'raw': s['raw'],
-            '_score': sc,
-            '_dt': dt
-        })
 
-    s_val = (q or '').strip()
-    is_regex = re.match(r"^\s*/.+/[a-zA-Z0-9]*\s*$", s_val)
-    if is_regex:
-        threshold = 60
+    cq = CompiledQuery(q)
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if cq.is_regex and cq.regex is not None:
+        err = regex_complexity_error(cq.regex.pattern)
+        if err:
+            logger.warning("api/search regex rejected q=%s reason=%s", (q or '')[:120], err)
+            return jsonify({"error": err}), 400
+
+    # 通过倒排索引取候选文档，正则模式无法使用索引，需要检查全部文档
+    search_index.sync()
+    if request.args.get('rank') == 'bm25' and not cq.is_regex:
+        limit = max(1, min(request.args.get('limit', type=int) or 20, 200))
+        offset = max(0, request.args.get('offset', type=int) or 0)
+        res = bm25_search(cq, limit, offset)
+        logger.info("api/search rank=bm25 q=%s matched=%s returned=%s", (q or '')[:120], res['count'], len(res['items']))
+        return jsonify(res)
+    cutoff = view_cutoff()
+    truncated = False
+    if cq.is_regex:
+        # 正则在工作进程池中对缓存的纯文本并行匹配，超时返回部分结果
+        docs = []
+        for doc_type, c in search_index.sources.items():
+            for e in c.visible(cutoff):
+                name, tags = search_fields(e, doc_type)
+                docs.append((f"{doc_type}:{e['filename']}", f"{name} {' '.join(tags)} {c.plain(e)}".lower()))
+        hits, truncated = regex_scanner.scan(cq.regex, docs) if cq.regex is not None else (set(), False)
+        candidates = []
+        for doc_id in hits:
+            doc_type, filename = doc_id.split(":", 1)
+            candidates.append((doc_type, search_index.sources[doc_type].peek(filename)))
     else:
-        small_ascii = len(s_val) < 2 and re.match(r"^[\x00-\x7F]+$", s_val or '')
-        threshold = 80 if small_ascii else 40
+        candidates = []
+        for doc_id in search_index.candidates(cq):
+            doc_type, filename = doc_id.split(":", 1)
+            candidates.append((doc_type, search_index.sources[doc_type].peek(filename)))
+
+    matched = []
+    for doc_type, e in candidates:
+        if e is None:
+            continue
+        catalog = search_index.sources[doc_type]
+        if cq.is_regex:
+            sc = 90  # 已在工作进程中确认命中
+        else:
+            name, tags = search_fields(e, doc_type)
+            sc = cq.score(catalog.plain(e), name=name, tags=tags)
+        if sc < cq.threshold:
+            continue
+        # 应用天数限制过滤
+        if not is_visible(e, cutoff):
+            continue
+        matched.append((sc, e["ts"], doc_type, e))
+    matched.sort(key=lambda x: (x[0], x[1]), reverse=True)
 
-    before = len(items)
-    items = [x for x in items if x.get('_score',0) >= threshold]
-    # 应用天数限制过滤
-    items = filter_by_time_limit(items, time_key="meta", time_field="time")
-    items.sort(key=lambda x: (x['_score'], x['_dt']), reverse=True)
-    for x in items:
-        x.pop('_score', None)
-        x.pop('_dt', None)
+    items = []
+    for _, _, doc_type, e in matched:
+        item = search_index.sources[doc_type].project(e, fields, convert_latex_to_mathml=convert_latex)
+        item['type'] = doc_type
+        items.append(item)
     res = { 'count': len(items), 'items': items }
-    logger.info("api/search q=%s matched=%s filtered_from=%s", (q or '')[:120], res['count'], before)
-    return jsonify(res)
+    if cq.is_regex:
+        res['truncated'] = truncated
+    logger.info("api/search q=%s matched=%s candidates=%s truncated=%s", (q or '')[:120], res['count'], len(candidates), truncated)
+    resp = jsonify(res)
+    if truncated:
+        # 超时截断的部分结果与同一内容版本下的完整结果不同，不能缓存，也不带 ETag（见 conditional_get）
+        resp.cache_control.no_store = True
+    return resp
 
 @app.route("/api/post/new", methods=["POST"])
 @require_api_key
@@ -669,7 +2857,8 @@ def api_post_new():
 
     # 生成文件名，例如: 2025-11-15-3.md
     date_part = time_str.split(" ")[0]  # 提取日期部分，保留横杠，例如: 2025-11-15
-    existing = [f for f in os.listdir("posts") if f.startswith(date_part)]
+    post_catalog.refresh(force=True)
+    existing = [f for f in post_catalog.filenames() if f.startswith(date_part)]
     idx = len(existing) + 1
     filename = f"{date_part}-{idx}.md"
     filepath = os.path.join("posts", filename)
@@ -687,7 +2876,8 @@ def api_post_new():
     convert_latex = not is_mobile  # 移动端不转换 LaTeX
     
     # 返回创建的动态
-    post = load_post(filepath, convert_latex_to_mathml=convert_latex)
+    post_catalog.touch(filename)
+    post = post_catalog.render(post_catalog.get(filename), convert_latex_to_mathml=convert_latex)
     logger.info("api/post/new filename=%s size=%s tags=%s, mobile=%s", filename, len(content), len(tags), is_mobile)
     return jsonify(post), 201
 
@@ -707,7 +2897,8 @@ def api_status_new():
 
     # 生成文件名，例如: 2025-11-15-1.md
     date_part = time_str.split(" ")[0]  # 提取日期部分，保留横杠，例如: 2025-11-15
-    existing = [f for f in os.listdir("status") if f.startswith(date_part)]
+    status_catalog.refresh(force=True)
+    existing = [f for f in status_catalog.filenames() if f.startswith(date_part)]
     idx = len(existing) + 1
     filename = f"{date_part}-{idx}.md"
     filepath = os.path.join("status", filename)
@@ -725,7 +2916,8 @@ def api_status_new():
 
     # 新建状态时，默认转换为 MathML（网页端显示）
     # 移动端会在下次请求时获取保留 LaTeX 的版本
-    status = load_status(filepath, convert_latex_to_mathml=True)
+    status_catalog.touch(filename)
+    status = status_catalog.render(status_catalog.get(filename), convert_latex_to_mathml=True)
     logger.info("api/status/new filename=%s size=%s name=%s icon=%s", filename, len(content), name, icon)
     return jsonify(status), 201
 
@@ -874,72 +3066,71 @@ def api_delete_file(filename):
     except Exception as e:
         logger.error(f"Delete error: {e}")
         return jsonify({"error": str(e)}), 500
-def list_status_or_posts(folder):
-    """读取状态或动态目录，按时间倒序返回解析结果"""
-    if not os.path.exists(folder):
-        return []
-
-    files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".md")]
-    items = []
+class UserInfoStats:
+    """/api/user/info 中的动态/状态数量与最新时间，内容变化时失效，请求时直接读取
 
-    for fp in files:
-        with open(fp, "r", encoding="utf-8") as f:
-            text = f.read()
-
-        if text.startswith("---"):
-            try:
-                _, fm, _ = text.split("---", 2)
-                meta = yaml.safe_load(fm) or {}
-            except:
-                meta = {}
-        else:
-            meta = {}
-
-        # 解析时间
-        t_str = meta.get("time", "1970-01-01 00:00:00")
-        try:
-            dt = datetime.strptime(t_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            dt = datetime(1970,1,1)
-
-        items.append({
-            "filename": os.path.basename(fp),
-            "meta": meta,
-            "_dt": dt
-        })
+    可见时间下限越过最早一个可见条目、或 view_time_limit_days 被修改（/api/reload、/api/config/edit）时重新统计
+    """
 
-    items.sort(key=lambda x: x["_dt"], reverse=True)
-    return items
+    def __init__(self, catalogs):
+        self.catalogs = catalogs
+        self._state = None
+        self._version = 0
+        self._lock = threading.Lock()
+        for catalog in catalogs.values():
+            catalog.add_listener(self.invalidate)
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._version += 1
+            self._state = None
+
+    def get(self):
+        cutoff = view_cutoff()
+        state = self._state
+        if (state is not None and state["view_limit"] == VIEW_LIMIT
+                and (state["expires"] is None or cutoff is None or cutoff <= state["expires"])):
+            return state["stats"]
+        with self._lock:
+            version = self._version
+        stats = {}
+        expires = []
+        for key, catalog in self.catalogs.items():
+            latest = catalog.latest(cutoff)
+            stats[f"{key}_count"] = catalog.count_visible(cutoff)
+            stats[f"latest_{key}_time"] = latest["meta"].get("time") if latest else None
+            expiry = catalog.next_expiry(cutoff)
+            if expiry is not None:
+                expires.append(expiry)
+        with self._lock:
+            if version == self._version:
+                self._state = {"stats": stats, "view_limit": VIEW_LIMIT,
+                               "expires": min(expires) if expires else None}
+        return stats
+
+user_info_stats = UserInfoStats({"post": post_catalog, "status": status_catalog})
 
 @app.route("/api/user/info")
+@conditional_get
 def api_user_info():
     """获取用户基础信息（头像、昵称、动态数量等）"""
 
-    # 读取 posts 数量与最新时间（考虑天数限制）
-    posts = list_status_or_posts("posts")
-    posts = filter_by_time_limit(posts, time_key="meta", time_field="time")
-    post_count = len(posts)
-    latest_post_time = posts[0]["meta"].get("time") if post_count > 0 else None
-
-    # 读取 status 数量与最新时间（考虑天数限制）
-    statuses = list_status_or_posts("status")
-    statuses = filter_by_time_limit(statuses, time_key="meta", time_field="time")
-    status_count = len(statuses)
-    latest_status_time = statuses[0]["meta"].get("time") if status_count > 0 else None
-
+    # 数量与最新时间（考虑天数限制）由 user_info_stats 维护
+    stats = user_info_stats.get()
     info = {
         "nickname": nickname,
         "avatar": avatar,
-        "post_count": post_count,
-        "status_count": status_count,
+        "post_count": stats["post_count"],
+        "status_count": stats["status_count"],
         "view_time_limit_days": VIEW_LIMIT,
-        "latest_post_time": latest_post_time,
-        "latest_status_time": latest_status_time
+        "latest_post_time": stats["latest_post_time"],
+        "latest_status_time": stats["latest_status_time"]
     }
 
     return jsonify(info)
 
 @app.route("/api/frontend/config")
+@conditional_get
 def api_frontend_config():
     """获取前端个性化配置"""
     # 从配置文件中读取 frontend.background.type
@@ -959,6 +3150,16 @@ def api_frontend_config():
     logger.info("api/frontend/config background=%s", background_type)
     return jsonify(result)
 
+@app.route("/api/cache/stats")
+@require_api_key
+def api_cache_stats():
+    """获取缓存统计信息"""
+    return jsonify({
+        "render": render_cache.stats(),
+        "formula": formula_cache.stats(),
+        "compressed": compressed_cache.stats()
+    })
+
 @app.route("/api/remove", methods=["POST"])
 @require_api_key
 def api_remove():
@@ -983,15 +3184,20 @@ def api_remove():
     
     # 构建文件路径
     folder = "posts" if file_type == "posts" else "status"
-    filepath = os.path.join(folder, filename)
+    catalog = CATALOGS[folder]
     
     # 检查文件是否存在
-    if not os.path.isfile(filepath):
+    if catalog.get(filename) is None:
         logger.warning("api/remove not_found type=%s file=%s", file_type, filename)
         return jsonify({"error": "File not found"}), 404
     
     try:
-        os.remove(filepath)
+        filepath = os.path.join(folder, filename)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        # 已归档的条目同时从打包文件中移除，否则会在普通文件删除后重新出现
+        catalog.packs.discard(filename)
+        catalog.touch(filename)
         logger.info("api/remove deleted type=%s file=%s", file_type, filename)
         return jsonify({"message": "File deleted", "type": file_type, "file": filename}), 200
     except Exception as e:
@@ -1016,28 +3222,17 @@ def api_post_edit():
         post_file = f"{post_file}.md"
     
     filepath = os.path.join("posts", post_file)
+    entry = post_catalog.get(post_file)
     
     # 检查文件是否存在
-    if not os.path.isfile(filepath):
+    if entry is None:
         logger.warning("api/post/edit not_found file=%s", post_file)
         return jsonify({"error": "Post not found"}), 404
     
-    # 读取现有文件
+    # 读取现有内容
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            text = f.read()
-        
-        # 解析现有内容
-        if text.startswith("---"):
-            try:
-                _, fm, body = text.split("---", 2)
-                meta = yaml.safe_load(fm) or {}
-            except:
-                meta = {}
-                body = text
-        else:
-            meta = {}
-            body = text
+        meta = dict(entry["meta"])
+        body = entry["body"]
         
         # 更新字段（如果提供了新值）
         if content is not None:
@@ -1059,13 +3254,16 @@ def api_post_edit():
                 f.write(f'tags: {meta["tags"]}\n')
             f.write("---\n\n")
             f.write(body)
+        # 已归档的动态编辑后以普通文件保存，并从打包文件中移除
+        post_catalog.packs.discard(post_file)
         
         # 检测是否为移动端请求
         is_mobile = is_mobile_client()
         convert_latex = not is_mobile  # 移动端不转换 LaTeX
         
         # 返回更新后的动态
-        post = load_post(filepath, convert_latex_to_mathml=convert_latex)
+        post_catalog.touch(post_file)
+        post = post_catalog.render(post_catalog.get(post_file), convert_latex_to_mathml=convert_latex)
         logger.info("api/post/edit updated file=%s, mobile=%s", post_file, is_mobile)
         return jsonify(post), 200
         
@@ -1093,28 +3291,17 @@ def api_status_edit():
         status_file = f"{status_file}.md"
     
     filepath = os.path.join("status", status_file)
+    entry = status_catalog.get(status_file)
     
     # 检查文件是否存在
-    if not os.path.isfile(filepath):
+    if entry is None:
         logger.warning("api/status/edit not_found file=%s", status_file)
         return jsonify({"error": "Status not found"}), 404
     
-    # 读取现有文件
+    # 读取现有内容
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            text = f.read()
-        
-        # 解析现有内容
-        if text.startswith("---"):
-            try:
-                _, fm, body = text.split("---", 2)
-                meta = yaml.safe_load(fm) or {}
-            except:
-                meta = {}
-                body = text
-        else:
-            meta = {}
-            body = text
+        meta = dict(entry["meta"])
+        body = entry["body"]
         
         # 更新字段（如果提供了新值）
         if content is not None:
@@ -1144,13 +3331,16 @@ def api_status_edit():
                 f.write(f'background: "{meta["background"]}"\n')
             f.write("---\n\n")
             f.write(body)
+        # 已归档的状态编辑后以普通文件保存，并从打包文件中移除
+        status_catalog.packs.discard(status_file)
         
         # 检测是否为移动端请求
         is_mobile = is_mobile_client()
         convert_latex = not is_mobile  # 移动端不转换 LaTeX
         
         # 返回更新后的状态
-        status = load_status(filepath, convert_latex_to_mathml=convert_latex)
+        status_catalog.touch(status_file)
+        status = status_catalog.render(status_catalog.get(status_file), convert_latex_to_mathml=convert_latex)
         logger.info("api/status/edit updated file=%s, mobile=%s", status_file, is_mobile)
         return jsonify(status), 200
         
@@ -1158,23 +3348,28 @@ def api_status_edit():
         logger.error("api/status/edit error file=%s error=%s", status_file, e)
         return jsonify({"error": str(e)}), 500
 
+def reload_config():
+    """重新读取 config.yaml 并更新全局变量"""
+    global config, API_KEY, VIEW_LIMIT, nickname, avatar, HOST, PORT
+
+    with open("config.yaml", "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    # 更新全局变量
+    API_KEY = config.get("api_key", "")
+    VIEW_LIMIT = config.get("view_time_limit_days", 9999)
+    nickname = config.get("nickname", "")
+    avatar = config.get("avatar", "")
+    HOST = config["server"].get("host", "127.0.0.1")
+    PORT = config["server"].get("port", 5000)
+
 @app.route("/api/reload", methods=["GET"])
 @require_api_key
 def api_reload():
     """刷新配置，重新读取config.yaml"""
-    global config, API_KEY, VIEW_LIMIT, nickname, avatar, HOST, PORT
-    
     try:
-        with open("config.yaml", "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-        
-        # 更新全局变量
-        API_KEY = config.get("api_key", "")
-        VIEW_LIMIT = config.get("view_time_limit_days", 9999)
-        nickname = config.get("nickname", "")
-        avatar = config.get("avatar", "")
-        HOST = config["server"].get("host", "127.0.0.1")
-        PORT = config["server"].get("port", 5000)
+        reload_config()
+        content_generation.bump()
         
         logger.info("api/reload success")
         return jsonify({
@@ -1215,8 +3410,6 @@ def api_get_config():
 @require_api_key
 def api_edit_config():
     """编辑配置文件（接收 YAML 格式）"""
-    global config, API_KEY, VIEW_LIMIT, nickname, avatar, HOST, PORT
-    
     try:
         # 获取请求体中的 YAML 内容
         yaml_content = request.get_data(as_text=True)
@@ -1244,13 +3437,8 @@ def api_edit_config():
             f.write(yaml_content)
         
         # 重新加载配置到内存
-        config = yaml.safe_load(yaml_content)
-        API_KEY = config.get("api_key", "")
-        VIEW_LIMIT = config.get("view_time_limit_days", 9999)
-        nickname = config.get("nickname", "")
-        avatar = config.get("avatar", "")
-        HOST = config["server"].get("host", "127.0.0.1")
-        PORT = config["server"].get("port", 5000)
+        reload_config()
+        content_generation.bump()
         
         logger.info("api/config/edit success")
         return jsonify({
@@ -1272,8 +3460,276 @@ def api_edit_config():
                 pass
         return jsonify({"error": str(e)}), 500
 
+def event_stream_id():
+    """事件 id 的前缀：启动标识 + 进程号。事件缓冲区属于单个进程，
+    生产模式下其他工作进程收到的 Last-Event-ID 前缀不同，会推送 reset 而不是从无关的位置续传"""
+    return f"{BOOT_ID}.{os.getpid()}"
+
+def sse_message(event, data, event_id=None):
+    """格式化一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_stream_id()}-{event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+@app.route("/api/events")
+def api_events():
+    """推送内容变更事件（Server-Sent Events），支持 Last-Event-ID 续传"""
+    current = event_bus.last_id
+    last_id, reset = current, False
+    last = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if last:
+        # 事件 id 带有启动标识和进程号，服务重启、换了工作进程或续传位置无效时通知客户端重新拉取
+        stream_id, _, n = last.rpartition("-")
+        if stream_id == event_stream_id() and n.isdigit() and int(n) <= current:
+            last_id = int(n)
+        else:
+            reset = True
+
+    if not event_bus.acquire():
+        logger.warning("api/events rejected subscribers=%s", event_bus.subscribers)
+        return jsonify({"error": "Too many subscribers"}), 503
+
+    heartbeat = EVENTS_CONFIG.get("heartbeat", 15)
+    poll = max(CACHE_CONFIG.get("scan_interval", 1.0), 0.5)
+
+    def stream(last_id, reset):
+        yield f"retry: {int(EVENTS_CONFIG.get('retry_ms', 3000))}\n\n"
+        if reset:
+            yield sse_message("reset", {"generation": content_generation.snapshot()[0]}, last_id)
+        last_sent = time.monotonic()
+        while True:
+            # 定期扫描磁盘，直接修改文件也会产生事件
+            refresh_catalogs()
+            events = event_bus.wait(last_id, poll)
+            if events is None:
+                # 续传位置已被挤出缓冲区
+                last_id = event_bus.last_id
+                events = []
+                yield sse_message("reset", {"generation": content_generation.snapshot()[0]}, last_id)
+                last_sent = time.monotonic()
+            for ev_id, name, data in events:
+                yield sse_message(name, data, ev_id)
+                last_id = ev_id
+                last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= heartbeat:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+
+    logger.info("api/events subscribe last_id=%s reset=%s subscribers=%s", last_id, reset, event_bus.subscribers)
+    resp = Response(stream(last_id, reset), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    # 无论生成器是否开始执行，连接关闭时都释放订阅名额
+    resp.call_on_close(event_bus.release)
+    return resp
+
+@app.route("/api/sync")
+@conditional_get
+def api_sync():
+    """增量同步：返回版本号 since 之后新增或编辑的动态/状态，以及删除的文件（墓碑）"""
+    is_mobile = is_mobile_client()
+    convert_latex = not is_mobile  # 移动端不转换 LaTeX
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    since = request.args.get("since", type=int)
+    boot_id = request.args.get("boot_id")
+    # 版本号只在同一次启动内有意义，没有 boot_id 时无法判断 since 之前的墓碑是否还在
+    if since is not None and not boot_id:
+        return jsonify({"error": "Parameter 'boot_id' is required with 'since'"}), 400
+
+    generation = content_generation.snapshot()[0]
+    cutoff = view_cutoff()
+    catalogs = {"post": post_catalog, "status": status_catalog}
+    # 没有 since、服务已重启、或 since 早于墓碑压缩的下限时，需要全量同步
+    full = since is None or since < change_log.floor or since > generation or boot_id != BOOT_ID
+    res = {"full": full, "generation": generation, "boot_id": BOOT_ID,
+           "posts": [], "statuses": [], "removed": []}
+    keys = {"post": "posts", "status": "statuses"}
+    if full:
+        for doc_type, catalog in catalogs.items():
+            res[keys[doc_type]] = [catalog.project(e, fields, convert_latex_to_mathml=convert_latex)
+                                   for e in catalog.visible(cutoff)]
+    else:
+        for doc_type, filename, gen, event in change_log.since(since):
+            catalog = catalogs[doc_type]
+            entry = catalog.peek(filename) if event != "removed" else None
+            # 已删除或编辑后超出可见天数的内容都作为墓碑返回
+            if entry is None or not is_visible(entry, cutoff):
+                res["removed"].append({"type": doc_type, "filename": filename, "generation": gen})
+            else:
+                res[keys[doc_type]].append(catalog.project(entry, fields, convert_latex_to_mathml=convert_latex))
+    logger.info("api/sync since=%s full=%s posts=%s statuses=%s removed=%s", since, full,
+                len(res["posts"]), len(res["statuses"]), len(res["removed"]))
+    return jsonify(res)
+
+@app.route("/api/ready")
+def api_ready():
+    """就绪检查：分词器和内容缓存都已预热时返回 200，否则返回 503"""
+    checks = {
+        "tokenizer": _jieba_state is not None,
+        "catalog": post_catalog.loaded and status_catalog.loaded,
+        "search_index": search_index.synced
+    }
+    ready = all(checks.values())
+    return jsonify({"ready": ready, **checks}), 200 if ready else 503
+
+def warm_up():
+    """预热分词器、内容目录与搜索索引"""
+    start = time.time()
+    try:
+        get_jieba()
+        regex_scanner.prepare()
+        for catalog in CATALOGS.values():
+            catalog.build(workers=CACHE_CONFIG.get("build_workers", 0),
+                          prerender=CACHE_CONFIG.get("prerender", True),
+                          min_files=CACHE_CONFIG.get("build_min_files", 200))
+        search_index.sync()
+        # 启动时读取文件产生的变更不属于增量，更早的 since 一律全量同步
+        change_log.rebase(content_generation.snapshot()[0])
+        logger.info("warm_up done dur=%.1fms", (time.time() - start) * 1000.0)
+    except Exception as e:
+        logger.error("warm_up error: %s", e)
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+def start_warm_up():
+    """按配置在后台线程中预热，每个进程只启动一次（搜索用的工作进程不预热）
+
+    导入本模块时不预热，由实际处理请求的进程调用：直接运行时在 __main__ / gunicorn post_fork 中调用，
+    外部 WSGI 服务器（如 gunicorn server:app）在进程收到第一个请求时调用
+    """
+    global _warm_up_thread
+    if not SEARCH_CONFIG.get("warm_up", True) or WORKER_PROCESS:
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+@app.before_request
+def _ensure_warm_up():
+    if _warm_up_thread is None:
+        start_warm_up()
+
+def run_production():
+    """生产模式入口：优先使用 gunicorn 多进程（每个进程多线程）运行，参数来自 config.yaml 的 production 配置
+
+    没有安装 gunicorn（例如 Windows）时依次退回 waitress、Werkzeug 多线程服务器（单进程）
+    """
+    workers = PRODUCTION_CONFIG.get("workers", 0) or (os.cpu_count() or 1) * 2 + 1
+    threads = PRODUCTION_CONFIG.get("threads", 4)
+    timeout = PRODUCTION_CONFIG.get("timeout", 30)
+    os.environ["MOMENTS_PRODUCTION"] = "1"
+    global BOOT_ID
+    if shared_cache is not None:
+        # 每次启动使用新的启动标识（导入时读到的是上次启动写入的值），工作进程 fork 后沿用
+        BOOT_ID = f"{int(time.time()):x}"
+        shared_cache.set_meta("boot_id", BOOT_ID)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class MomentsApplication(BaseApplication):
+            def load_config(self):
+                options = {
+                    "bind": f"{HOST}:{PORT}",
+                    "workers": workers,
+                    "threads": threads,
+                    "timeout": timeout,
+                    "graceful_timeout": PRODUCTION_CONFIG.get("graceful_timeout", 30),
+                    "keepalive": PRODUCTION_CONFIG.get("keepalive", 5),
+                    # 每个工作进程 fork 之后各自预热
+                    "post_fork": lambda server, worker: start_warm_up(),
+                }
+                for key, value in options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app
+
+        logger.info("production gunicorn bind=%s:%s workers=%s threads=%s timeout=%s", HOST, PORT, workers, threads, timeout)
+        MomentsApplication().run()
+        return
+
+    start_warm_up()
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is not None:
+        logger.warning("production gunicorn not installed, using waitress (single process) threads=%s", threads)
+        serve(app, host=HOST, port=PORT, threads=threads, channel_timeout=timeout)
+        return
+    logger.warning("production gunicorn/waitress not installed, using werkzeug threaded server (single process)")
+    app.run(host=HOST, port=PORT, debug=False, threaded=True)
+
+def compact_packs(days):
+    """把时间早于 days 天的普通文件按月份追加到打包文件（python server.py --compact）
+
+    每个月份先写入并同步 .pack、替换 .idx，再删除已打包的普通文件；打包期间被修改的文件保留为普通文件。
+    时间格式错误的条目不打包。服务运行期间也可以执行，各进程扫描目录时会读取新的 .idx
+    """
+    cutoff = time.time() - days * 86400
+    for folder, catalog in CATALOGS.items():
+        catalog.refresh(force=True)
+        months = {}
+        for entry in catalog.entries():
+            if entry["time_ok"] and entry["ts"] < cutoff:
+                # 按文件名中的月份分组，文件名不以日期开头的归入 other
+                month = entry["filename"][:7]
+                if not re.fullmatch(r"\d{4}-\d{2}", month):
+                    month = "other"
+                months.setdefault(month, []).append(entry["filename"])
+        packed = 0
+        for month, names in sorted(months.items()):
+            items = []
+            for name in sorted(names):
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    # 已在打包文件中
+                    continue
+                items.append((name, data, st.st_mtime_ns, path, (st.st_size, st.st_mtime_ns)))
+            if not items:
+                continue
+            catalog.packs.append(month, [item[:3] for item in items])
+            for name, data, _, path, sig in items:
+                try:
+                    st = os.stat(path)
+                    if (st.st_size, st.st_mtime_ns) != sig or len(data) != st.st_size:
+                        # 打包期间被修改：保留普通文件，撤销打包
+                        logger.warning("compact skipped modified file folder=%s file=%s", folder, name)
+                        catalog.packs.discard(name)
+                        continue
+                    os.remove(path)
+                    packed += 1
+                except OSError as e:
+                    logger.warning("compact remove error folder=%s file=%s error=%s", folder, name, e)
+        logger.info("compact folder=%s days=%s packed=%s months=%s", folder, days, packed, len(months))
+
 if __name__ == "__main__":
-    app.run(host=HOST, port=PORT, debug=1)
+    if COMPACT:
+        compact_packs(PACKS_CONFIG.get("older_than_days", 365))
+    elif PRODUCTION:
+        run_production()
+    else:
+        # 调试服务器的重载器父进程只监视文件变化，只在处理请求的子进程中预热
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_warm_up()
+        app.run(host=HOST, port=PORT, debug=1)
 
 #启动备注:cmd.exe /K "C:\Ruibin_Ningh\app\Anaconda\Scripts\activate.bat" TongYong
 
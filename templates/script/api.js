@@ -182,6 +182,19 @@
     return sortByTimeDesc(list);
   }
 
+  /**
+   * 功能：按天/按月统计日期区间内的动态和状态数量（日历标记用）
+   * 输入：from/to 日期字符串，granularity 为 day 或 month
+   * 返回：{ granularity, from, to, post_count, status_count, buckets: [{ date, post_count, status_count }] }
+   */
+  async function getArchive(from, to, granularity = 'day') {
+    const params = new URLSearchParams({ granularity });
+    if (from) params.set('from', from);
+    if (to) params.set('to', to);
+    const data = await fetchJSON(`/api/archive?${params}`);
+    return data || { granularity, from, to, post_count: 0, status_count: 0, buckets: [] };
+  }
+
   async function getFrontendConfig() {
     const data = await fetchJSON('/api/frontend/config');
     return data || { background: 'image' };
@@ -196,6 +209,7 @@
     searchAll,
     getPostsByDate,
     getStatusesByDate,
+    getArchive,
     getFrontendConfig,
     formatTime,
     parseTime,
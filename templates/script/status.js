@@ -110,22 +110,20 @@ function initCalendar() {
   let cursor = new Date();
   let selectedDateStr = todayStr;
   
-  // 加载所有状态，用于日历标记
-  let allStatuses = [];
+  // 日历标记：按当前显示的 6 周区间请求 /api/archive，每天的状态图标由服务端统计，不再下载全部状态
   let statusDaysMap = new Map();
+  const archiveCache = new Map();
+  let renderSeq = 0;
   
-  async function loadStatuses() {
-    allStatuses = await window.API.getStatusHistory();
-    statusDaysMap.clear();
-    allStatuses.forEach(s => { 
-      const d = (s.meta?.time||'').slice(0,10); 
-      if (d) {
-        const icon = s.meta?.icon || '';
-        if (!statusDaysMap.has(d) || icon) {
-          statusDaysMap.set(d, icon);
-        }
-      }
-    });
+  async function loadMarkers(from, to) {
+    const key = `${from}~${to}`;
+    let buckets = archiveCache.get(key);
+    if (!buckets) {
+      const data = await window.API.getArchive(from, to);
+      buckets = Array.isArray(data?.buckets) ? data.buckets : [];
+      archiveCache.set(key, buckets);
+    }
+    statusDaysMap = new Map(buckets.filter(b => b.status_count > 0).map(b => [b.date, b.status_icon || '']));
   }
 
   function daysInMonth(y,m){ return new Date(y, m+1, 0).getDate(); }
@@ -178,7 +176,8 @@ function initCalendar() {
     return card;
   }
 
-  function renderGrid(dir){
+  async function renderGrid(dir){
+    const seq = ++renderSeq;
     const y = cursor.getFullYear(); const m = cursor.getMonth();
     monthLabel.textContent = `${y}年${String(m+1).padStart(2,'0')}月`;
     const first = startWeekday(y,m);
@@ -188,6 +187,9 @@ function initCalendar() {
     for (let i=0;i<first;i++){ const d = prevTotal-first+i+1; cells.push({ num:d, other:true, date:new Date(y,m-1,d)}); }
     for (let d=1; d<=total; d++){ cells.push({ num:d, other:false, date:new Date(y,m,d)}); }
     const tail = 42 - cells.length; for (let i=1;i<=tail;i++){ cells.push({ num:i, other:true, date:new Date(y,m+1,i)}); }
+    await loadMarkers(fmtDate(cells[0].date), fmtDate(cells[cells.length-1].date));
+    // 快速翻月时只绘制最后一次请求的月份
+    if (seq !== renderSeq) return;
 
     grid.innerHTML = '';
     const frag = document.createDocumentFragment();
@@ -228,10 +230,8 @@ function initCalendar() {
   nextBtn.addEventListener('click', () => { cursor.setMonth(cursor.getMonth()+1); renderGrid('left'); });
 
   // 初始化
-  loadStatuses().then(() => {
-    renderDayPanel(selectedDateStr);
-    renderGrid();
-  });
+  renderDayPanel(selectedDateStr);
+  renderGrid();
 }
 
 /**
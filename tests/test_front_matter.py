@@ -0,0 +1,89 @@
+"""parse_simple_front_matter 与 yaml.safe_load 的一致性测试"""
+import glob
+import os
+import sys
+
+import pytest
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from front_matter import parse_simple_front_matter
+
+# 快速解析必须接受，且结果与 YAML 完全一致
+ACCEPTED = [
+    # 写入接口生成的格式
+    '\ntime: "2025-11-15 10:00:00"\ntags: ["日常", "AI"]\n',
+    '\nname: "学习中"\nicon: "📚"\nbackground: "#E3F2FD"\ntime: "2025-11-15 10:00:00"\n',
+    # 引号字符串
+    '\nname: ""\n',
+    '\nname: "带 空格 和 # 号"\n',
+    "\ntags: ['单引号', \"双引号\"]\n",
+    '\nname: "it\'s"\n',
+    # 列表
+    "\ntags: []\n",
+    "\ntags: [ ]\n",
+    '\ntags: [ "a" ,"b",  "c" ]\n',
+    # Emoji 和非 ASCII 的无引号值
+    "\nicon: 💻\n",
+    "\nicon: ❤️\n",
+    "\nname: 摸鱼中\n",
+    # 空行、行尾空格和 CRLF
+    '\r\ntime: "2025-11-15 10:00:00"  \r\n\r\nname: "x"\r\n',
+    "",
+    "\n\n",
+]
+
+# 快速解析必须放弃（返回 None），交给 YAML 解析器
+FALLBACK = [
+    # 未知字段、大写字段、重复字段
+    '\nauthor: "a"\n',
+    '\nTime: "2025-11-15 10:00:00"\n',
+    '\nname: "a"\nname: "b"\n',
+    # 无引号的 ASCII 值（可能是日期、数字、布尔值或 null）
+    "\ntime: 2025-11-15 10:00:00\n",
+    "\nname: true\n",
+    "\nname: null\n",
+    "\nname: 1.5\n",
+    # 转义和不完整的引号
+    '\nname: "a\\nb"\n',
+    '\nname: "a\n',
+    "\nname: 'it''s'\n",
+    # 注释、行尾制表符、冒号后没有空格
+    '\nname: "a"  # 注释\n',
+    '\nname: "a"\t\n',
+    '\nname:"a"\n',
+    # 多行列表、嵌套列表、块列表
+    '\ntags: ["a",\n  "b"]\n',
+    '\ntags: [["a"]]\n',
+    "\ntags:\n  - a\n",
+    # 无引号的列表元素、流式映射
+    "\ntags: [a, b]\n",
+    '\nname: {"a": 1}\n',
+]
+
+
+@pytest.mark.parametrize("fm", ACCEPTED)
+def test_accepted_matches_yaml(fm):
+    meta = parse_simple_front_matter(fm)
+    assert meta is not None
+    assert meta == (yaml.safe_load(fm) or {})
+
+
+@pytest.mark.parametrize("fm", FALLBACK)
+def test_fallback(fm):
+    assert parse_simple_front_matter(fm) is None
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROOT, "posts", "*.md"))
+                                        + glob.glob(os.path.join(ROOT, "status", "*.md"))))
+def test_repo_files(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if not text.startswith("---"):
+        pytest.skip("no front matter")
+    _, fm, _ = text.split("---", 2)
+    meta = parse_simple_front_matter(fm)
+    if meta is not None:
+        assert meta == (yaml.safe_load(fm) or {})
@@ -0,0 +1,44 @@
+"""元数据旁路文件：重启时直接还原条目，不打开 .md 文件"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import server
+
+
+def test_restart_from_sidecar_reads_no_files(tmp_path, monkeypatch):
+    for catalog in server.CATALOGS.values():
+        catalog.refresh(force=True)
+    path = str(tmp_path / "metadata.json")
+    first = server.MetadataCatalog(path, server.CATALOGS, save_delay=3600)
+    first._dirty = True
+    first.save()
+
+    # 模拟重启：新的目录和旁路文件，快照监听与启动时相同
+    catalogs = {folder: server.ContentCatalog(folder) for folder in server.CATALOGS}
+    monkeypatch.setattr(server, "metadata_catalog", server.MetadataCatalog(path, catalogs, save_delay=3600))
+    monkeypatch.setattr(server, "shared_cache", None)
+    snapshots = server.FeedSnapshots(delay=0)
+    reads = []
+    read_text = server.read_text
+    monkeypatch.setattr(server, "read_text", lambda *args: reads.append(args) or read_text(*args))
+    for catalog in catalogs.values():
+        catalog.add_listener(snapshots.on_change)
+        catalog.build(workers=1)
+    time.sleep(0.1)
+
+    entries = [e for catalog in catalogs.values() for e in catalog.entries()]
+    assert len(entries) == sum(len(c.entries()) for c in server.CATALOGS.values())
+    assert all(isinstance(e, server.LazyEntry) for e in entries)
+    assert reads == []
+    assert snapshots._timer is None
+
+    # 首次访问正文时才读取文件，结果与直接解析一致
+    for folder, catalog in catalogs.items():
+        for e in catalog.entries():
+            ref = server.read_entry(folder, e["filename"], e["sig"])
+            assert (e["raw"], e["body"], e["meta"], e["digest"]) == (ref["raw"], ref["body"], ref["meta"], ref["digest"])
@@ -0,0 +1,61 @@
+"""默认搜索（倒排取候选 + 打分）与逐条使用优化前打分函数的结果一致性测试"""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import server
+from bench_search import original_score_item
+
+
+def expected(q):
+    """优化前的做法：对全部可见文档逐条打分"""
+    small_ascii = len(q.strip()) < 2 and bool(server.ASCII_RE.match(q.strip()))
+    threshold = 80 if small_ascii else 40
+    cutoff = server.view_cutoff()
+    result = set()
+    for doc_type, catalog in server.search_index.sources.items():
+        for e in catalog.visible(cutoff):
+            name, tags = server.search_fields(e, doc_type)
+            if original_score_item(q, catalog.plain(e), name=name, tags=tags) >= threshold:
+                result.add((doc_type, e["filename"]))
+    return result
+
+
+def queries():
+    """语料中随机截取的 1-4 字子串（含跨分词边界的片段和标点），以及若干固定查询"""
+    texts = []
+    for doc_type, catalog in server.search_index.sources.items():
+        for e in catalog.entries():
+            name, tags = server.search_fields(e, doc_type)
+            texts.append(f"{name} {' '.join(tags)} {catalog.plain(e)}")
+    rnd = random.Random(5)
+    result = ["乐放", "于支", "。", "，", "开发 优化", "a b", "API", "a", "动态", "不存在的词"]
+    for _ in range(300):
+        text = rnd.choice(texts)
+        n = rnd.randint(1, 4)
+        i = rnd.randrange(max(1, len(text) - n))
+        q = text[i:i + n].strip()
+        if q and not server.REGEX_QUERY_RE.match(q):
+            result.append(q)
+    return result
+
+
+@pytest.fixture(scope="module")
+def client():
+    for catalog in server.CATALOGS.values():
+        catalog.refresh(force=True)
+    server.search_index.sync()
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("q", queries())
+def test_search_matches_original_scorer(client, q):
+    res = client.get("/api/search", query_string={"q": q, "fields": "filename"}).get_json()
+    got = {(item["type"], item["filename"]) for item in res["items"]}
+    assert got == expected(q)